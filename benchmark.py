@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import reporting
+
+START_YEAR = 2021
+POLLUTANTS = ["no", "pm10", "pm25"]
+BASELINE_LEVELS = {"no": 20.0, "pm10": 18.0, "pm25": 10.0}  # Typical hourly concentration of each pollutant
+RESULTS_FILE = "bench_output.json"
+REGRESSION_TOLERANCE = 0.25  # Fractional slow down allowed before a benchmark is reported as a regression
+
+
+def generate_station(filename, years=1, missing_rate=0.01, seed=0):
+    """
+    Writes a synthetic station csv file in the same format as the files in the data directory.
+    The same arguments always produce the same file.
+    Parameters:
+        filename (str): The path of the csv file to write.
+        years (int): The number of years of hourly readings, starting on the 1st January 2021.
+        missing_rate (float): The fraction of readings replaced by "No data".
+        seed (int): The seed for the random number generator.
+    Returns:
+        The number of readings written.
+    """
+
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range(f"{START_YEAR}-01-01 01:00", f"{START_YEAR + years}-01-01 00:00", freq="h")
+    days = timestamps - pd.Timedelta(hours=1)  # 24:00 readings belong to the previous day
+    hours = days.hour.to_numpy() + 1
+    station_data = pd.DataFrame({"date": days.strftime("%Y-%m-%d"),
+                                 "time": [f"{hour:02d}:00:00" for hour in hours]})
+    diurnal_cycle = 1 + 0.5 * np.sin((hours - 9) * np.pi / 12)  # Peaks in the afternoon
+    for pollutant in POLLUTANTS:
+        values = BASELINE_LEVELS[pollutant] * diurnal_cycle * rng.lognormal(0, 0.5, len(timestamps))
+        values[rng.random(len(timestamps)) < missing_rate] = np.nan
+        station_data[pollutant] = values
+    station_data.to_csv(filename, index=False, na_rep=reporting.MISSING_DATA, float_format="%.5f")
+    return len(station_data)
+
+
+def generate_dataset(directory, years=1, stations=3, missing_rate=0.01, seed=0):
+    """
+    Writes a set of synthetic station csv files.
+    Parameters:
+        directory (str): The directory to write the Pollution-*.csv files to.
+        years (int): The number of years of hourly readings for each station.
+        stations (int): The number of stations.
+        missing_rate (float): The fraction of readings replaced by "No data".
+        seed (int): The seed for the first station. Each station uses the next seed.
+    Returns:
+        A list of the paths of the csv files written.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    filenames = []
+    for station in range(stations):
+        filename = os.path.join(directory, f"{reporting.STATION_FILE_PREFIX}Station {station + 1}.csv")
+        generate_station(filename, years, missing_rate, seed + station)
+        filenames.append(filename)
+    return filenames
+
+
+def get_benchmarks(data):
+    """
+    Gets the reporting functions to benchmark, each called for every station and pollutant.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+    Returns:
+        A dictionary mapping each benchmark name to a function taking the data, station and pollutant.
+    """
+
+    first_day = reporting.get_days(next(iter(data.values()))).min()
+    return {
+        "daily_average": reporting.daily_average,
+        "daily_median": reporting.daily_median,
+        "hourly_average": reporting.hourly_average,
+        "monthly_average": reporting.monthly_average,
+        "peak_hour_date": lambda d, station, pollutant: reporting.peak_hour_date(d, first_day, station, pollutant),
+        "count_missing_data": reporting.count_missing_data,
+        "fill_missing_data": lambda d, station, pollutant: reporting.fill_missing_data(
+            {station: d[station].copy()}, 0, station, pollutant),  # Works on a copy so later runs still see gaps
+    }
+
+
+def time_function(function, repeats=5):
+    """
+    Times a function and measures the peak memory it allocates.
+    Parameters:
+        function (callable): The function to call without arguments.
+        repeats (int): The number of timed calls.
+    Returns:
+        A dictionary with the "best" and "mean" time in seconds and the "peak_memory" in bytes.
+    """
+
+    function()  # Warms up any cached indexes so every timed call does the same work
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()  # Traced separately as tracing slows down the timed calls
+    function()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"best": min(times), "mean": sum(times) / len(times), "peak_memory": peak_memory}
+
+
+def run_benchmarks(sizes=(1, 2, 4), stations=3, missing_rate=0.01, repeats=5, seed=0):
+    """
+    Times every reporting function on synthetic data sets of increasing size.
+    Parameters:
+        sizes (tuple): The number of years of readings in each data set.
+        stations (int): The number of stations in each data set.
+        missing_rate (float): The fraction of readings replaced by "No data".
+        repeats (int): The number of timed calls of each function.
+        seed (int): The seed for the synthetic data.
+    Returns:
+        A list of dictionaries, one for each function and size, holding the timings and the size of the data set.
+    """
+
+    results = []
+    for years in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            generate_dataset(directory, years, stations, missing_rate, seed)
+            data = reporting.load_data(directory=directory)
+            loading = time_function(lambda: reporting.load_data(directory=directory, workers=1), repeats)
+            results.append({"name": "load_data", "years": years, "stations": stations, **loading})
+            data.load_all()
+            for name, function in get_benchmarks(data).items():
+                timings = time_function(lambda: [function(data, station, pollutant)
+                                                 for station in data for pollutant in POLLUTANTS], repeats)
+                results.append({"name": name, "years": years, "stations": stations, **timings})
+    return results
+
+
+def save_results(results, filename=RESULTS_FILE):
+    """
+    Saves benchmark results as JSON along with the versions they were measured with.
+    Parameters:
+        results (list): The results from run_benchmarks.
+        filename (str): The path of the JSON file to write.
+    """
+
+    with open(filename, "w") as file:
+        json.dump({"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+                   "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}, file, indent=2)
+
+
+def load_results(filename=RESULTS_FILE):
+    """
+    Loads benchmark results saved by save_results.
+    Parameters:
+        filename (str): The path of the JSON file.
+    Returns:
+        The list of results.
+    """
+
+    with open(filename) as file:
+        return json.load(file)["results"]
+
+
+def compare_results(baseline, results, tolerance=REGRESSION_TOLERANCE):
+    """
+    Finds the benchmarks that have become slower since a baseline run.
+    Parameters:
+        baseline (list): The results of the earlier run.
+        results (list): The results of the new run.
+        tolerance (float): The fractional slow down allowed before a benchmark counts as a regression.
+    Returns:
+        A list of (name, years, stations, baseline time, new time) for every regression.
+    """
+
+    baseline_times = {(r["name"], r["years"], r["stations"]): r["best"] for r in baseline}
+    regressions = []
+    for result in results:
+        key = (result["name"], result["years"], result["stations"])
+        if key in baseline_times and result["best"] > baseline_times[key] * (1 + tolerance):
+            regressions.append((*key, baseline_times[key], result["best"]))
+    return regressions
+
+
+def main():
+    """
+    Runs the benchmarks from the command line.
+    """
+
+    parser = argparse.ArgumentParser(description="Benchmarks the reporting module on synthetic data.")
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 2, 4], help="sizes of the data sets in years")
+    parser.add_argument("--stations", type=int, default=3, help="number of stations in each data set")
+    parser.add_argument("--missing-rate", type=float, default=0.01, help="fraction of readings with no data")
+    parser.add_argument("--repeats", type=int, default=5, help="number of timed calls of each function")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic data")
+    parser.add_argument("--output", default=RESULTS_FILE, help="JSON file to save the results to")
+    parser.add_argument("--compare", help="JSON file of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="fractional slow down reported as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.years, args.stations, args.missing_rate, args.repeats, args.seed)
+    for result in results:
+        print(f"{result['name']:<20} {result['years']:>3}y {result['stations']:>3} stations "
+              f"{result['best'] * 1000:>10.2f} ms {result['peak_memory'] / 2 ** 20:>8.2f} MiB")
+    save_results(results, args.output)
+    if args.compare:
+        regressions = compare_results(load_results(args.compare), results, args.tolerance)
+        for name, years, stations, old_time, new_time in regressions:
+            print(f"Regression: {name} ({years}y, {stations} stations) {old_time * 1000:.2f} ms -> "
+                  f"{new_time * 1000:.2f} ms")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
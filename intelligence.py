@@ -2,11 +2,17 @@
 # You should modify the functions below to match
 # the signatures determined by the project specification
 import math
+import os.path
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from skimage import io
 from skimage import img_as_ubyte
 
 
+CHANNELS = ("red", "green", "blue", "alpha")
+STRIP_ROWS = 256  # Rows of a large image held in memory at once when it is processed in strips
+
+
 def find_red_pixels(*args, **kwargs):
     """
     Finds all the red pixels in the image and produces an output image of the red pixels.
@@ -19,27 +25,13 @@ def find_red_pixels(*args, **kwargs):
     """
 
     map_filename = args[0]
-    upper_threshold = kwargs["upper_threshold"]
-    lower_threshold = kwargs["lower_threshold"]
-    img = io.imread(f"data/{map_filename}")  # Reads the file into a numpy matrix with 3 dimensions
-
-    rows = img.shape[0]
-    cols = img.shape[1]
-    result = np.zeros((rows, cols))  # Initialises a matrix of 0's with the same resolution as the image
-
-    for i in range(rows):
-        for j in range(cols):
-            r, g, b, a = img[i][j]  # Unpacks the pixel into RGBA values. The alpha channel is discarded as JPEG does
-            # not support transparency
-            if r > upper_threshold and g < lower_threshold and b < lower_threshold:
-                result[i][j] = 1  # Requirements met for red pixel
-    io.imsave("map-red-pixels.jpg", result)  # Save matrix into a JPEG image
-    return result
+    rule = red_rule(kwargs["upper_threshold"], kwargs["lower_threshold"])
+    return find_colour_pixels(map_filename, rule, "map-red-pixels.jpg")
 
 
 def find_cyan_pixels(*args, **kwargs):
     """
-    Finds all the cyan pixels in the image and produces an output image of the red pixels.
+    Finds all the cyan pixels in the image and produces an output image of the cyan pixels.
     Parameters:
         map_filename (str): The name of the image located in the data directory.
         upper_threshold (int): The value of the upper threshold for the green and blue values.
@@ -49,74 +41,537 @@ def find_cyan_pixels(*args, **kwargs):
     """
 
     map_filename = args[0]
-    upper_threshold = kwargs["upper_threshold"]
-    lower_threshold = kwargs["lower_threshold"]
-    img = io.imread(f"data/{map_filename}")  # Reads the file into a numpy matrix with 3 dimensions
-    rows = img.shape[0]
-    cols = img.shape[1]
-    result = np.zeros((rows, cols))  # Initialises a matrix of 0's with the same resolution as the image
-
-    for i in range(rows):
-        for j in range(cols):
-            r, g, b, a = img[i][j]  # Unpacks the pixel into RGBA values. The alpha channel is discarded as JPEG does
-            # not support transparency
-            if r < lower_threshold and g > upper_threshold and b > upper_threshold:
-                result[i][j] = 1  # Requirements met for cyan pixel
-    io.imsave("map-cyan-pixels.jpg", result)  # Save matrix into a JPEG image
+    rule = cyan_rule(kwargs["upper_threshold"], kwargs["lower_threshold"])
+    return find_colour_pixels(map_filename, rule, "map-cyan-pixels.jpg")
+
+
+def red_rule(upper_threshold, lower_threshold):
+    """
+    Creates the colour rule for red pixels.
+    Parameters:
+        upper_threshold (int): The value the red channel must be above.
+        lower_threshold (int): The value the green and blue channels must be below.
+    Returns:
+        A colour rule for colour_mask.
+    """
+
+    return colour_rule(red=(upper_threshold, None), green=(None, lower_threshold), blue=(None, lower_threshold))
+
+
+def cyan_rule(upper_threshold, lower_threshold):
+    """
+    Creates the colour rule for cyan pixels.
+    Parameters:
+        upper_threshold (int): The value the green and blue channels must be above.
+        lower_threshold (int): The value the red channel must be below.
+    Returns:
+        A colour rule for colour_mask.
+    """
+
+    return colour_rule(red=(None, lower_threshold), green=(upper_threshold, None), blue=(upper_threshold, None))
+
+
+def colour_rule(red=None, green=None, blue=None, alpha=None):
+    """
+    Creates a colour rule from bounds on each channel. A pixel matches when every bounded channel is strictly
+    above its lower bound and strictly below its upper bound.
+    Parameters:
+        red (tuple): The (lower, upper) bounds for the red channel. Either bound may be None for no limit.
+        green (tuple): The (lower, upper) bounds for the green channel.
+        blue (tuple): The (lower, upper) bounds for the blue channel.
+        alpha (tuple): The (lower, upper) bounds for the alpha channel.
+    Returns:
+        A dictionary mapping each bounded channel to its (lower, upper) bounds.
+    """
+
+    bounds = {"red": red, "green": green, "blue": blue, "alpha": alpha}
+    return {channel: bound for channel, bound in bounds.items() if bound is not None}
+
+
+def get_channels(img):
+    """
+    Splits an image into its colour channels without copying them.
+    Grayscale images use the same values for red, green and blue, and images without transparency are opaque.
+    Parameters:
+        img (numpy.ndarray): A grayscale (rows, cols), RGB (rows, cols, 3) or RGBA (rows, cols, 4) image.
+    Returns:
+        A dictionary mapping "red", "green", "blue" and "alpha" to 2D arrays (or None for a missing alpha channel).
+    """
+
+    if img.ndim == 2:  # Grayscale
+        return {"red": img, "green": img, "blue": img, "alpha": None}
+    if img.ndim != 3 or img.shape[2] not in (2, 3, 4):
+        raise ValueError(f"Unsupported image shape {img.shape}")
+    if img.shape[2] == 2:  # Grayscale with alpha
+        return {"red": img[..., 0], "green": img[..., 0], "blue": img[..., 0], "alpha": img[..., 1]}
+    return {"red": img[..., 0], "green": img[..., 1], "blue": img[..., 2],
+            "alpha": img[..., 3] if img.shape[2] == 4 else None}
+
+
+def colour_mask(img, rule):
+    """
+    Finds the pixels matching a colour rule with vectorised comparisons over the whole image.
+    Parameters:
+        img (numpy.ndarray): A grayscale, RGB or RGBA image.
+        rule (dict): A colour rule from colour_rule.
+    Returns:
+        A 2D boolean numpy array which is True for each matching pixel.
+    """
+
+    channels = get_channels(img)
+    mask = np.ones(img.shape[:2], dtype=bool)
+    comparison = np.empty(img.shape[:2], dtype=bool)  # Reused for every comparison to limit memory use
+    for channel, (lower, upper) in rule.items():
+        values = channels[channel]
+        if values is None:  # No alpha channel, so every pixel is fully opaque
+            values = np.full(img.shape[:2], np.iinfo(img.dtype).max if img.dtype.kind in "ui" else 1.0)
+        if lower is not None:
+            np.greater(values, lower, out=comparison)
+            mask &= comparison
+        if upper is not None:
+            np.less(values, upper, out=comparison)
+            mask &= comparison
+    return mask
+
+
+def find_colour_pixels(map_filename, rule, output_filename=None):
+    """
+    Finds all the pixels matching a colour rule in an image and optionally saves them as a black and white image.
+    Parameters:
+        map_filename (str): The name of the image located in the data directory.
+        rule (dict): A colour rule from colour_rule.
+        output_filename (str): The JPEG file to save the matching pixels to, or None to not save them.
+    Returns:
+        A 2D numpy matrix of 1's and 0's where 1 represents a matching pixel and 0 represents all others.
+    """
+
+    img = io.imread(f"data/{map_filename}")  # Reads the file into a numpy matrix
+    result = colour_mask(img, rule).astype(np.float64)
+    if output_filename is not None:
+        io.imsave(output_filename, img_as_ubyte(result))  # JPEG only supports 8-bit images
     return result
 
 
+def segment_map(map_filename, classes):
+    """
+    Reads an image once and classifies every pixel into one of several colour classes.
+    Parameters:
+        map_filename (str): The name of the image located in the data directory.
+        classes (dict): Dictionary mapping each class name to its colour rule.
+    Returns:
+        A 2D uint8 numpy array of labels, see segment_colours.
+    """
+
+    return segment_colours(io.imread(f"data/{map_filename}"), classes)
+
+
+def segment_colours(img, classes):
+    """
+    Classifies every pixel into one of several colour classes in a single pass over the image.
+    Each channel value is looked up in a table holding a bit for every class that the value satisfies, so a pixel's
+    classes are found with one lookup per channel however many classes there are.
+    Parameters:
+        img (numpy.ndarray): A grayscale, RGB or RGBA image.
+        classes (dict): Dictionary mapping each class name to its colour rule. At most 64 classes are supported.
+    Returns:
+        A 2D uint8 numpy array holding 0 for pixels that match no class, otherwise the position (from 1) of the first
+        matching class in classes.
+    """
+
+    rules = list(classes.values())
+    if len(rules) > 64:
+        raise ValueError("At most 64 colour classes are supported")
+    channels = get_channels(img)
+    if img.dtype not in (np.uint8, np.uint16):  # Too many levels for lookup tables, so test each class in turn
+        bits = np.zeros(img.shape[:2], dtype=np.uint64)
+        for position, rule in enumerate(rules):
+            bits |= colour_mask(img, rule).astype(np.uint64) << np.uint64(position)
+    else:
+        tables = channel_lookup_tables(rules, np.iinfo(img.dtype).max + 1)
+        bits = tables["red"][channels["red"]]
+        for channel in CHANNELS[1:]:
+            if channels[channel] is not None:
+                bits &= tables[channel][channels[channel]]
+            else:  # No alpha channel, so every pixel is fully opaque
+                bits &= tables[channel][-1]
+    return first_set_bit(bits)
+
+
+def channel_lookup_tables(rules, levels):
+    """
+    Builds a lookup table for each channel giving the classes whose bounds accept each channel value.
+    Parameters:
+        rules (list): The colour rule of each class.
+        levels (int): The number of possible channel values, e.g. 256 for 8-bit images.
+    Returns:
+        A dictionary mapping each channel to an array of length levels, where bit i of entry v is set if class i
+        accepts the value v for that channel.
+    """
+
+    dtype = next(t for t in (np.uint8, np.uint16, np.uint32, np.uint64) if np.iinfo(t).bits >= len(rules))
+    values = np.arange(levels)
+    tables = {channel: np.zeros(levels, dtype=dtype) for channel in CHANNELS}
+    for position, rule in enumerate(rules):
+        bit = dtype(1) << dtype(position)
+        for channel, (lower, upper) in rule.items():
+            rejected = np.zeros(levels, dtype=bool)
+            if lower is not None:
+                rejected |= values <= lower
+            if upper is not None:
+                rejected |= values >= upper
+            tables[channel] |= np.where(rejected, dtype(0), bit)
+        for channel in CHANNELS:  # Channels without bounds accept every value
+            if channel not in rule:
+                tables[channel] |= bit
+    return tables
+
+
+def first_set_bit(bits):
+    """
+    Finds the position of the lowest set bit of each value.
+    Parameters:
+        bits (numpy.ndarray): An array of unsigned integers.
+    Returns:
+        A uint8 numpy array of the same shape holding 0 where no bit is set, otherwise the position of the lowest set
+        bit plus one.
+    """
+
+    if bits.dtype == np.uint8:  # A table of all 256 values is cheaper than the arithmetic
+        return first_set_bit(np.arange(256, dtype=np.uint16)).astype(np.uint8)[bits]
+    lowest = bits.astype(np.uint64) & (~bits.astype(np.uint64) + np.uint64(1))  # Isolates the lowest set bit
+    labels = np.zeros(bits.shape, dtype=np.uint8)
+    set_bits = lowest != 0
+    labels[set_bits] = np.log2(lowest[set_bits]).astype(np.uint8) + 1  # Exact for powers of two
+    return labels
+
+
+def class_masks(labels, classes):
+    """
+    Gets the binary mask of each class from a label image.
+    Parameters:
+        labels (numpy.ndarray): The label image from segment_colours.
+        classes (dict): The classes passed to segment_colours.
+    Returns:
+        A dictionary mapping each class name to a 2D boolean numpy array.
+    """
+
+    return {name: labels == position + 1 for position, name in enumerate(classes)}
+
+
+def open_image(filename):
+    """
+    Opens an image so that its rows can be read without loading the whole image into memory where possible.
+    Parameters:
+        filename (str): The path of the image. NumPy .npy files and uncompressed TIFF files are memory-mapped.
+            Other formats, including compressed TIFF files, are read into memory.
+    Returns:
+        A numpy array (or read-only memory map) of the image.
+    """
+
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".npy":
+        return np.load(filename, mmap_mode="r")
+    if extension in (".tif", ".tiff"):
+        import tifffile  # Only needed for TIFF mosaics
+        try:
+            return tifffile.memmap(filename, mode="r")
+        except ValueError:  # Compressed or tiled TIFF files cannot be memory-mapped
+            return tifffile.imread(filename)
+    return io.imread(filename)
+
+
+def stream_colour_mask(image_filename, rule, mask_filename, strip_rows=STRIP_ROWS, labeler=None):
+    """
+    Finds the pixels matching a colour rule one horizontal strip at a time, writing the mask to a memory-mapped file,
+    so that only one strip of the image and mask is held in memory at once.
+    Parameters:
+        image_filename (str): The path of the image, see open_image.
+        rule (dict): A colour rule from colour_rule.
+        mask_filename (str): The .npy file to write the boolean mask to.
+        strip_rows (int): The number of rows in each strip.
+        labeler (StripLabeler): If given, each strip of the mask is also added to this labeler.
+    Returns:
+        A numpy memory map of the 2D boolean mask.
+    """
+
+    img = open_image(image_filename)
+    mask = np.lib.format.open_memmap(mask_filename, mode="w+", dtype=np.bool_, shape=img.shape[:2])
+    for start in range(0, img.shape[0], strip_rows):
+        strip_mask = colour_mask(np.asarray(img[start:start + strip_rows]), rule)
+        mask[start:start + strip_rows] = strip_mask
+        if labeler is not None:
+            labeler.add(strip_mask)
+    mask.flush()
+    return mask
+
+
+def stream_connected_components(mask, labels_filename, connectivity=8, strip_rows=STRIP_ROWS):
+    """
+    Labels the connected components of a (memory-mapped) mask one horizontal strip at a time.
+    Parameters:
+        mask (numpy.ndarray): The 2D matrix in which to find the connected components.
+        labels_filename (str): The .npy file to write the int32 labels to.
+        connectivity (int): 8 to connect diagonal neighbours or 4 to only connect horizontal and vertical neighbours.
+        strip_rows (int): The number of rows in each strip.
+    Returns:
+        A tuple of a numpy memory map of the labels and a numpy array of the number of pixels with each label, which
+        are identical to label_components.
+    """
+
+    labeler = StripLabeler(labels_filename, mask.shape, connectivity)
+    for start in range(0, mask.shape[0], strip_rows):
+        labeler.add(np.asarray(mask[start:start + strip_rows]))
+    return labeler.finish(strip_rows)
+
+
 def detect_connected_components(*args, **kwargs):
     """
     Finds all the connected components in the matrix passed in. Also writes number of pixels per components to a text file.
-    Algorithm improvements: The algorithm has been modified to count the number of pixels per connected component by
-    assigning a unique number to each pixel depending on which connected component they are in. The output of mark is
-    therefore the same as img except that the 1's are now changed into a variety of integer values showing the
-    connected component that hte pixel belongs to. The algorithm can be further improved by removing the gathering
-    of all 8-neighbours if they those neighbours have already been checked on a previous pass.
+    Components are numbered in the order their first pixel appears scanning row by row, see label_components.
     Parameters:
         img (numpy.ndarray): The matrix of 1's and 0's in which to find the connected components.
+        connectivity (int): 8 to connect diagonal neighbours (the default) or 4 to only connect horizontal and
+            vertical neighbours.
+        workers (int): If given, the matrix is split into strips labelled by this many processes.
     Returns:
-        A 2D numpy array consisting of the different connected components identified by a unique ID.
+        A 2D int32 numpy array consisting of the different connected components identified by a unique ID.
     """
-    # TODO: add unit tests to utils
+
     img = args[0]
-    mark = np.zeros(img.shape)  # Create matrix of same size as the matrix passed in
-    q = np.empty((0, 2), int)  # Creates an empty ndarray with shape (0,2) and holds integers
-    count = 0
-    connected_components = 0
-    with open("cc-output-2a.txt", "w") as f:  # Creates the empty text file
-        pass
-    for x in range(img.shape[0]):
-        for y in range(img.shape[1]):
-            pixel = img[x][y]
-            if pixel == 1 and mark[x][y] == 0:  # If pixel is part of a component but not visited
-                print(pixel)
-                mark[x][y] = connected_components + 1  # Set as visited
-                count += 1  # Increase number of pixels in this connected component
-                q = np.append(q, np.array([[x, y]]), axis=0)  # Add this pixel to the queue of pixels to visit
-                while len(q) > 0:
-                    item = q[0]
-                    q = np.delete(q, 0, axis=0)  # Remove pixel visited from the queue
-                    neighbours = get_neighbours(item, img.shape)  # Get all neighbours of pixel
-                    print(neighbours)
-                    exit()
-                    for nx, ny in neighbours:
-                        if img[nx][ny] == 1 and mark[nx][ny] == 0:  # If neighbour is part of a component but not
-                            # visited
-                            mark[nx][ny] = connected_components + 1  # Set as visited
-                            count += 1  # Increase number of pixels in this connected component
-                            q = np.append(q, np.array([[nx, ny]]), axis=0)  # Add this neighbour to the queue of
-                            # pixels to visit
-                connected_components += 1  # Move to next connected component when no more pixels left in this one
-                with open("cc-output-2a.txt", "a") as f:
-                    f.write(f"Connected Component {connected_components}, number of pixels = {count}\n")
-                count = 0
-    with open("cc-output-2a.txt", "a") as f:
-        f.write(f"Total number of connected components = {connected_components}")
+    connectivity = kwargs.get("connectivity", 8)
+    if kwargs.get("workers") is None:
+        mark, counts = label_components(img, connectivity)
+    else:
+        mark, counts = label_components_tiled(img, connectivity, kwargs["workers"])
+    lines = [f"Connected Component {label}, number of pixels = {count}\n"
+             for label, count in enumerate(counts[1:].tolist(), start=1)]
+    with open("cc-output-2a.txt", "w") as f:
+        f.write("".join(lines) + f"Total number of connected components = {len(lines)}")
     return mark
 
 
+def label_components(img, connectivity=8):
+    """
+    Labels the connected components of the non-zero pixels with a two pass scan over runs of pixels.
+    The first pass finds the horizontal runs of each row and unites every pair of overlapping runs in adjacent rows
+    using a union-find. The second pass gives each run the label of its component.
+    Parameters:
+        img (numpy.ndarray): The 2D matrix in which to find the connected components.
+        connectivity (int): 8 to connect diagonal neighbours or 4 to only connect horizontal and vertical neighbours.
+    Returns:
+        A tuple of a 2D int32 numpy array of labels, numbered from 1 in the order each component's first pixel
+        appears scanning row by row (0 is the background), and a numpy array of the number of pixels with each label.
+    """
+
+    if connectivity not in (4, 8):
+        raise ValueError("connectivity must be 4 or 8")
+    rows, cols = img.shape
+    starts, ends, width = get_runs(np.asarray(img) != 0)
+
+    # First pass: unite the runs that touch a run on the row above
+    reach = 1 if connectivity == 8 else 0  # How far diagonally a run reaches into the next row
+    below_starts = starts - width  # Each run moved up onto the row above
+    below_ends = ends - width
+    first = np.searchsorted(ends, below_starts - reach, side="right")  # Runs above ending after this one starts
+    last = np.searchsorted(starts, below_ends + reach, side="left")  # Runs above starting before this one ends
+    touching = last - first
+    lower_runs = np.repeat(np.arange(len(starts)), touching)
+    upper_runs = np.repeat(first, touching) + np.arange(touching.sum()) - np.repeat(np.cumsum(touching) - touching,
+                                                                                    touching)
+    parent = list(range(len(starts)))
+    rank = [0] * len(starts)
+    for lower, upper in zip(lower_runs.tolist(), upper_runs.tolist()):
+        union(parent, rank, lower, upper)
+
+    # Second pass: label each run by the order its component first appears
+    roots = np.array([find(parent, run) for run in range(len(starts))], dtype=np.int64)
+    _, first_runs, components = np.unique(roots, return_index=True, return_inverse=True)
+    order = np.empty(len(first_runs), dtype=np.int32)
+    order[np.argsort(first_runs)] = np.arange(1, len(first_runs) + 1, dtype=np.int32)
+    run_labels = order[components]
+
+    lengths = ends - starts
+    labels = np.zeros(rows * width, dtype=np.int32)
+    labels[np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())] = \
+        np.repeat(run_labels, lengths)
+    counts = np.bincount(run_labels, weights=lengths, minlength=len(first_runs) + 1).astype(np.int64)
+    counts[0] = rows * cols - lengths.sum()
+    return labels.reshape(rows, width)[:, :cols], counts
+
+
+def label_components_tiled(img, connectivity=8, workers=None, strip_rows=None):
+    """
+    Labels the connected components of the non-zero pixels by splitting the matrix into horizontal strips, labelling
+    each strip separately and merging the components that meet at the seams between strips.
+    The labels and counts are identical to label_components.
+    Parameters:
+        img (numpy.ndarray): The 2D matrix in which to find the connected components.
+        connectivity (int): 8 to connect diagonal neighbours or 4 to only connect horizontal and vertical neighbours.
+        workers (int): The number of processes to share the strips between. Runs in this process if None.
+        strip_rows (int): The number of rows in each strip. Defaults to an equal share for each worker.
+    Returns:
+        A tuple of a 2D int32 numpy array of labels and a numpy array of the number of pixels with each label.
+    """
+
+    binary = np.asarray(img) != 0
+    rows = binary.shape[0]
+    if strip_rows is None:
+        strip_rows = max(1, math.ceil(rows / (workers or 1)))
+    strips = [binary[start:start + strip_rows] for start in range(0, rows, strip_rows)]
+    if len(strips) <= 1:
+        return label_components(binary, connectivity)
+    if workers is None:
+        results = [label_components(strip, connectivity) for strip in strips]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:  # Strips are labelled independently
+            results = list(executor.map(label_components, strips, [connectivity] * len(strips)))
+    return merge_strips(results, connectivity)
+
+
+def merge_strips(results, connectivity=8):
+    """
+    Combines the labels of consecutive horizontal strips into the labels of the whole matrix.
+    Components touching across the seam between two strips are merged with a union-find over the strip labels.
+    Parameters:
+        results (list): The (labels, counts) of each strip from label_components, from top to bottom. The label
+            arrays are modified.
+        connectivity (int): The connectivity the strips were labelled with.
+    Returns:
+        A tuple of a 2D int32 numpy array of labels, numbered from 1 in the order each component's first pixel
+        appears scanning row by row, and a numpy array of the number of pixels with each label.
+    """
+
+    offsets = np.cumsum([0] + [len(counts) - 1 for _, counts in results])
+    for (labels, _), offset in zip(results, offsets):
+        labels[labels > 0] += offset  # Number every strip's labels after the strips above it
+
+    num_labels = int(offsets[-1])
+    parent = list(range(num_labels + 1))
+    rank = [0] * (num_labels + 1)
+    merged = set()  # Labels on a seam, the only ones which may not be their own root
+    for (upper, _), (lower, _) in zip(results[:-1], results[1:]):
+        merged.update(unite_seam(parent, rank, upper[-1], lower[0], connectivity))
+    mapping = component_mapping(parent, merged)
+
+    labels = np.empty((sum(len(strip) for strip, _ in results), results[0][0].shape[1]), dtype=np.int32)
+    start = 0
+    for strip, _ in results:
+        labels[start:start + len(strip)] = mapping[strip]
+        start += len(strip)
+    strip_counts = [counts for _, counts in results]
+    counts = np.bincount(mapping[1:], weights=np.concatenate([c[1:] for c in strip_counts]),
+                         minlength=mapping.max() + 1).astype(np.int64)
+    counts[0] = sum(int(c[0]) for c in strip_counts)  # Background pixels
+    return labels, counts
+
+
+def unite_seam(parent, rank, above, below, connectivity=8):
+    """
+    Unites the labels of touching pixels on either side of the seam between two strips.
+    Parameters:
+        parent (list): The union-find parent of each label.
+        rank (list): The union-find rank of each label.
+        above (numpy.ndarray): The labels of the last row of the upper strip.
+        below (numpy.ndarray): The labels of the first row of the lower strip.
+        connectivity (int): 8 to connect diagonal neighbours or 4 to only connect vertical neighbours.
+    Returns:
+        A set of the labels that were united.
+    """
+
+    cols = len(above)
+    merged = set()
+    for shift in ((-1, 0, 1) if connectivity == 8 else (0,)):  # Pairs of pixels (above[c], below[c + shift])
+        above_labels = above[max(0, -shift):cols - max(0, shift)]
+        below_labels = below[max(0, shift):cols - max(0, -shift)]
+        touching = (above_labels > 0) & (below_labels > 0)
+        pairs = np.unique(np.stack([above_labels[touching], below_labels[touching]], axis=1), axis=0)
+        for first, second in pairs.tolist():
+            union(parent, rank, first, second)
+            merged.update((first, second))
+    return merged
+
+
+def component_mapping(parent, merged):
+    """
+    Gets the final label of every provisional label once all the unions are done.
+    Each component keeps its smallest provisional label, so components stay in the order of their first pixel when
+    the provisional labels were given out in raster order.
+    Parameters:
+        parent (list): The union-find parent of each label, where label 0 is the background.
+        merged (set): The labels that were united. Every other label is its own root.
+    Returns:
+        An int32 numpy array mapping each provisional label to its final label, numbered from 1 (0 stays 0).
+    """
+
+    num_labels = len(parent) - 1
+    roots = np.arange(num_labels + 1)
+    for label in merged:
+        roots[label] = find(parent, label)
+    smallest = np.full(num_labels + 1, num_labels + 1, dtype=np.int64)
+    np.minimum.at(smallest, roots, np.arange(num_labels + 1))
+    component_first = smallest[roots]
+    return np.searchsorted(np.unique(component_first), component_first).astype(np.int32)
+
+
+def get_runs(binary):
+    """
+    Finds the horizontal runs of True pixels in each row.
+    Each row is padded with a False column so that runs end at the edge of the row and positions in adjacent rows are
+    exactly one padded width apart.
+    Parameters:
+        binary (numpy.ndarray): A 2D boolean matrix.
+    Returns:
+        A tuple of the start and end (exclusive) of each run as positions in the flattened padded matrix, in row by row
+        order, and the padded width.
+    """
+
+    rows, cols = binary.shape
+    width = cols + 1
+    padded = np.zeros((rows, width), dtype=np.int8)
+    padded[:, :cols] = binary
+    changes = np.diff(padded.ravel(), prepend=0)
+    return np.flatnonzero(changes == 1), np.flatnonzero(changes == -1), width
+
+
+def find(parent, item):
+    """
+    Finds the root of an item's set in a union-find, pointing every item on the way directly at the root.
+    Parameters:
+        parent (list): The parent of each item. Roots are their own parent.
+        item (int): The item to find.
+    Returns:
+        The root of the set containing the item.
+    """
+
+    root = item
+    while parent[root] != root:
+        root = parent[root]
+    while parent[item] != root:  # Path compression
+        parent[item], item = root, parent[item]
+    return root
+
+
+def union(parent, rank, first, second):
+    """
+    Merges the sets of two items in a union-find, attaching the shallower tree below the deeper one.
+    Parameters:
+        parent (list): The parent of each item.
+        rank (list): An upper bound on the height of the tree below each root.
+        first (int): An item in the first set.
+        second (int): An item in the second set.
+    """
+
+    first = find(parent, first)
+    second = find(parent, second)
+    if first == second:
+        return
+    if rank[first] < rank[second]:  # Union by rank
+        first, second = second, first
+    parent[second] = first
+    if rank[first] == rank[second]:
+        rank[first] += 1
+
+
 def get_neighbours(pixel, map_size):
     """
     Finds all the neigbours of the given pixel.
@@ -166,9 +621,8 @@ def write_top_two(mark, top_two):
         top_two (list): The ID's for the top two connected components.
     """
 
-    mark[(mark != top_two[0]) & (mark != top_two[1])] = 0  # Set all pixels to 0 if they are not part of the top two
-    mark[mark != 0] = 1  # Set all remaining pixels to 1 (the top two connected components)
-    io.imsave("cc-top-2.jpg", img_as_ubyte(mark))
+    top = np.isin(mark, top_two)  # True for the pixels of the top two connected components
+    io.imsave("cc-top-2.jpg", img_as_ubyte(top))
 
 
 def quick_sort(array, low, high):
@@ -212,3 +666,70 @@ def partition(array, low, high):
         if left >= right:
             return right  # Return index at which pointers cross
         array[left], array[right] = array[right], array[left]  # Swap values
+
+
+class StripLabeler:
+    """
+    Incremental connected component labeller for images too large to fit in memory.
+    Strips are added from top to bottom. Each strip is labelled on its own and written to a memory-mapped file with
+    provisional labels, and only the last row of the previous strip is kept to unite the components meeting at the
+    seam. Once every strip has been added, a second pass over the file replaces the provisional labels.
+    """
+
+    def __init__(self, labels_filename, shape, connectivity=8):
+        """
+        Parameters:
+            labels_filename (str): The .npy file to write the int32 labels to.
+            shape (tuple): The (rows, cols) of the whole image.
+            connectivity (int): 8 to connect diagonal neighbours or 4 to only connect horizontal and vertical
+                neighbours.
+        """
+
+        self.labels = np.lib.format.open_memmap(labels_filename, mode="w+", dtype=np.int32, shape=tuple(shape))
+        self.connectivity = connectivity
+        self.rows = 0  # Rows added so far
+        self.boundary = None  # Provisional labels of the last row added
+        self.parent = [0]  # Union-find over the provisional labels, where 0 is the background
+        self.rank = [0]
+        self.merged = set()
+        self.counts = [np.zeros(1, dtype=np.int64)]  # Background pixels, then the pixels of each provisional label
+
+    def add(self, strip):
+        """
+        Labels the next strip of the image.
+        Parameters:
+            strip (numpy.ndarray): The next rows of the mask.
+        """
+
+        strip_labels, counts = label_components(strip, self.connectivity)
+        offset = len(self.parent) - 1
+        strip_labels[strip_labels > 0] += offset  # Number the strip's labels after those given out already
+        self.parent.extend(range(offset + 1, offset + len(counts)))
+        self.rank.extend([0] * (len(counts) - 1))
+        if self.boundary is not None and len(strip_labels):
+            self.merged.update(unite_seam(self.parent, self.rank, self.boundary, strip_labels[0], self.connectivity))
+        self.labels[self.rows:self.rows + len(strip_labels)] = strip_labels
+        self.rows += len(strip_labels)
+        if len(strip_labels):
+            self.boundary = strip_labels[-1].copy()
+        self.counts[0] += counts[0]
+        self.counts.append(counts[1:])
+
+    def finish(self, strip_rows=STRIP_ROWS):
+        """
+        Replaces the provisional labels with the final labels.
+        Parameters:
+            strip_rows (int): The number of rows relabelled at a time.
+        Returns:
+            A tuple of the numpy memory map of the labels, numbered from 1 in the order each component's first pixel
+            appears scanning row by row, and a numpy array of the number of pixels with each label.
+        """
+
+        mapping = component_mapping(self.parent, self.merged)
+        for start in range(0, self.rows, strip_rows):
+            self.labels[start:start + strip_rows] = mapping[self.labels[start:start + strip_rows]]
+        self.labels.flush()
+        counts = np.bincount(mapping[1:], weights=np.concatenate(self.counts[1:]),
+                             minlength=mapping.max() + 1).astype(np.int64)
+        counts[0] = self.counts[0][0]
+        return self.labels, counts
@@ -1,9 +1,49 @@
 # This is a template. 
 # You should modify the functions below to match
 # the signatures determined by the project specification
+import argparse
+import contextlib
+import csv
+import importlib.util
+import json
 import os.path
+import subprocess
+import sys
 from utils import color, format_message
-import intelligence, reporting, monitoring
+
+
+def lazy_import(name):
+    """
+    Imports a module the first time one of its attributes is used, so unused modules cost nothing at startup.
+    Parameters:
+        name (str): The name of the module.
+    Returns:
+        The module, which is loaded on first attribute access.
+    """
+
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+np = lazy_import("numpy")
+intelligence = lazy_import("intelligence")  # scikit-image
+reporting = lazy_import("reporting")  # pandas
+monitoring = lazy_import("monitoring")  # pandas and requests
+
+OUTPUT_FORMATS = ["csv", "json", "text"]
+OUTPUT_BUFFER_SIZE = 1 << 20  # Results are written to files in 1MiB blocks
+REPORTING_OPERATIONS = ["daily-average", "daily-median", "hourly-average", "monthly-average", "peak-hour",
+                        "missing-data", "fill-missing"]
+INTELLIGENCE_OPERATIONS = ["red-pixels", "cyan-pixels", "connected-components"]
+MONITORING_OPERATIONS = ["site-codes", "species", "indices", "trend", "map", "health-advice"]
+MENU_STATIONS = ["Marylebone Road", "Harlington", "N Kensington"]  # Menu order before stations were discovered
+IMPORT_TIME_MODULES = ["utils", "reporting", "intelligence", "monitoring"]
 
 
 def main_menu():
@@ -56,10 +96,10 @@ def reporting_menu():
     """
 
     print(format_message("Welcome to the Pollution Reporting Module!", color.BOLD, color.UNDERLINE, color.DARKCYAN))
-    monitoring_station = choose_station()
+    data = reporting.load_data()  # Find the CSV files. Each station is only loaded once it is used
+    monitoring_station = choose_station(menu_stations(data))
     pollutant = choose_pollutant()
     show_reporting_functions()
-    data = reporting.load_data()  # Load CSV data
     while True:
         user_choice = input(format_message("Enter an option 1-9: ", color.BOLD, color.PURPLE)).upper()
         if user_choice == "1":  # Daily average
@@ -90,15 +130,14 @@ def reporting_menu():
             for hour, value in enumerate(hourly_average):
                 print(format_message(f"{hour}".zfill(2), color.BOLD, color.BLUE) +
                       format_message(":00 : ", color.BOLD, color.BLUE) +
-                      format_message(f"{round(value, 2)}", color.GREEN))
+                      format_message(f"{round(value, 2) if type(value) == float else value}", color.GREEN))
             show_reporting_functions()
         elif user_choice == "4":  # Monthly average
             print(format_message(
                 f"Calculating monthly average for pollutant {pollutant.upper()} at {monitoring_station}... (2dp)",
                 color.BOLD, color.BLUE))
             monthly_average = reporting.monthly_average(data, monitoring_station, pollutant)
-            months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Aug", "Sep", "Oct", "Nov", "Dec"]
-            for month, value in zip(months, monthly_average):
+            for month, value in zip(reporting.MONTHS, monthly_average):
                 print(format_message(f"{month}: ", color.BOLD, color.BLUE) +
                       format_message(f"{round(value, 2) if type(value) == float else value}", color.GREEN))
             show_reporting_functions()
@@ -126,6 +165,9 @@ def reporting_menu():
         elif user_choice == "7":  # Fill missing data
             new_value = input(
                 format_message("Enter the new value to replace missing entries: ", color.BOLD, color.PURPLE))
+            while not is_number(new_value):  # Pollutant values are stored as floats
+                new_value = input(
+                    format_message("Enter a numerical value to replace missing entries: ", color.BOLD, color.PURPLE))
             print(format_message(
                 f"Replacing missing data with {new_value}...",
                 color.BOLD, color.BLUE))
@@ -135,7 +177,7 @@ def reporting_menu():
                 color.GREEN))
             show_reporting_functions()
         elif user_choice == "8":  # Re-choose station and pollutant
-            monitoring_station = choose_station()
+            monitoring_station = choose_station(menu_stations(data))
             pollutant = choose_pollutant()
             show_reporting_functions()
         elif user_choice == "9":  # Go back to main menu
@@ -143,6 +185,22 @@ def reporting_menu():
             break
 
 
+def is_number(value):
+    """
+    Checks whether a string entered by the user can be converted into a float.
+    Parameters:
+        value (str): The string to check.
+    Returns:
+        True if the string is a valid number, otherwise False.
+    """
+
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
 def show_reporting_functions():
     """
     Prints out reporting function options
@@ -154,19 +212,34 @@ def show_reporting_functions():
     show_module_options(desc)
 
 
-def choose_station():
+def menu_stations(data):
+    """
+    Gets the order in which monitoring stations are offered in the menu.
+    The original stations keep their numbers so piped menu choices still pick the same station.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+    Returns:
+        A list of the original stations that are available, followed by any other discovered stations.
+    """
+
+    return [s for s in MENU_STATIONS if s in data] + [s for s in data.keys() if s not in MENU_STATIONS]
+
+
+def choose_station(stations):
     """
     Allows user to choose a valid monitoring station.
+    Parameters:
+        stations (list): The names of the available monitoring stations.
     Returns:
         A string name of the chosen monitoring station.
     """
-    stations = ["Marylebone Road", "Harlington", "N Kensington"]
     for i in range(len(stations)):
         print(f"{format_message(str(i + 1), color.BLUE)} - {format_message(stations[i], color.GREEN)}")
     print("\n")
     while True:
-        user_choice = input(format_message("Choose a monitoring station 1-3: ", color.BOLD, color.PURPLE)).upper()
-        if user_choice in ["1", "2", "3"]:
+        user_choice = input(format_message(f"Choose a monitoring station 1-{len(stations)}: ", color.BOLD,
+                                           color.PURPLE)).upper()
+        if user_choice in [str(i + 1) for i in range(len(stations))]:
             return stations[int(user_choice) - 1]
 
 
@@ -348,5 +421,264 @@ def quit():
     exit()
 
 
+def build_parser():
+    """
+    Builds the parser for the non-interactive command line.
+    Returns:
+        An argparse.ArgumentParser with a sub-command for each module and operation.
+    """
+
+    output_parser = argparse.ArgumentParser(add_help=False)  # Output options shared by every operation
+    output_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", help="format of the results")
+    output_parser.add_argument("--output", help="file to write the results to (default: stdout)")
+
+    parser = argparse.ArgumentParser(description="AQUA command line. Run without arguments for the interactive menu.")
+    modules = parser.add_subparsers(dest="module", required=True)
+
+    reporting_parser = modules.add_parser("reporting", help="pollution reporting")
+    operations = reporting_parser.add_subparsers(dest="operation", required=True)
+    for operation in REPORTING_OPERATIONS:
+        operation_parser = operations.add_parser(operation, parents=[output_parser])
+        operation_parser.add_argument("--station", action="append",
+                                      help="monitoring station, may be repeated (default: every station)")
+        operation_parser.add_argument("--pollutant", action="append", choices=["no", "pm10", "pm25"],
+                                      help="pollutant, may be repeated (default: every pollutant)")
+        operation_parser.add_argument("--directory", default="data",
+                                      help="directory containing the Pollution-*.csv files")
+        if operation == "peak-hour":
+            operation_parser.add_argument("--date", required=True, help="date to search (YYYY-MM-DD)")
+        elif operation == "fill-missing":
+            operation_parser.add_argument("--value", type=float, help="value to replace missing entries with")
+            operation_parser.add_argument("--method", choices=["constant", "ffill", "linear", "profile"],
+                                          default="constant", help="how to fill the missing entries")
+            operation_parser.add_argument("--limit", type=int, help="longest gap to fill, in readings")
+
+    intelligence_parser = modules.add_parser("intelligence", help="mobility intelligence")
+    operations = intelligence_parser.add_subparsers(dest="operation", required=True)
+    for operation in INTELLIGENCE_OPERATIONS:
+        operation_parser = operations.add_parser(operation, parents=[output_parser])
+        operation_parser.add_argument("--map", default="map.png", help="map filename located at data/map_filename")
+        operation_parser.add_argument("--upper-threshold", type=int, default=100)
+        operation_parser.add_argument("--lower-threshold", type=int, default=50)
+        if operation == "connected-components":
+            operation_parser.add_argument("--colour", choices=["red", "cyan"], default="red")
+            operation_parser.add_argument("--sorted", action="store_true",
+                                          help="also sort the components and save the two largest")
+
+    monitoring_parser = modules.add_parser("monitoring", help="real-time monitoring")
+    operations = monitoring_parser.add_subparsers(dest="operation", required=True)
+    for operation in MONITORING_OPERATIONS:
+        operation_parser = operations.add_parser(operation, parents=[output_parser])
+        if operation == "trend":
+            operation_parser.add_argument("--site", required=True, help="site code")
+        elif operation == "map":
+            operation_parser.add_argument("--pollutant", required=True, help="pollutant code")
+        elif operation == "health-advice":
+            operation_parser.add_argument("--index", type=int, required=True, help="air quality index")
+
+    import_times_parser = modules.add_parser("import-times", parents=[output_parser],
+                                             help="measure the startup cost of each module")
+    import_times_parser.add_argument("--repeats", type=int, default=3, help="number of fresh interpreters per module")
+    return parser
+
+
+def measure_import_times(repeats=3):
+    """
+    Measures how long each module takes to import in a fresh interpreter, including its dependencies.
+    Parameters:
+        repeats (int): The number of interpreters started for each module. The fastest time is reported.
+    Returns:
+        A tuple of the column names and one row of (module, seconds) for each module and for main itself.
+    """
+
+    rows = []
+    for name in ["main", *IMPORT_TIME_MODULES]:
+        code = f"import time; start = time.perf_counter(); import {name}; print(time.perf_counter() - start)"
+        times = [float(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                      cwd=os.path.dirname(os.path.abspath(__file__))).stdout)
+                 for _ in range(repeats)]
+        rows.append([name, min(times)])
+    return ["module", "seconds"], rows
+
+
+def run_reporting(args, parser):
+    """
+    Runs a reporting operation for every chosen station and pollutant.
+    Parameters:
+        args (argparse.Namespace): The parsed command line arguments.
+        parser (argparse.ArgumentParser): The parser, used to report invalid stations.
+    Returns:
+        A tuple of the column names and the list of result rows.
+    """
+
+    data = reporting.load_data(directory=args.directory)
+    stations = args.station or list(data.keys())
+    for monitoring_station in stations:
+        if monitoring_station not in data:
+            parser.error(f"unknown station {monitoring_station!r}, choose from {', '.join(data.keys())}")
+    pollutants = args.pollutant or ["no", "pm10", "pm25"]
+
+    rows = []
+    if args.operation == "fill-missing":
+        if args.method == "constant" and args.value is None:
+            parser.error("--value is required for the constant method")
+        for monitoring_station in stations:
+            reporting.fill_station_gaps(data, monitoring_station, args.method, args.value, args.limit, pollutants)
+            station_data = data[monitoring_station]
+            columns = [station_data["date"].tolist(), station_data["time"].tolist()] + \
+                      [[None if value != value else value for value in station_data[pollutant].tolist()]
+                       for pollutant in pollutants]  # Gaps left by --limit are None rather than NaN
+            rows.extend([monitoring_station, *row] for row in zip(*columns))
+        return ["station", "date", "time", *pollutants], rows
+
+    for monitoring_station in stations:
+        station_data = data[monitoring_station]
+        for pollutant in pollutants:
+            if args.operation == "daily-average" or args.operation == "daily-median":
+                function = reporting.daily_average if args.operation == "daily-average" else reporting.daily_median
+                values = function(data, monitoring_station, pollutant)
+                first_day = reporting.get_days(station_data).min()
+                labels = np.arange(first_day, first_day + len(values)).astype(str)
+            elif args.operation == "hourly-average":
+                values = reporting.hourly_average(data, monitoring_station, pollutant)
+                labels = [f"{hour + 1:02d}:00" for hour in range(len(values))]
+            elif args.operation == "monthly-average":
+                values = reporting.monthly_average(data, monitoring_station, pollutant)
+                labels = [reporting.MONTHS[month] for month in np.unique(reporting.get_months(station_data))]
+            elif args.operation == "peak-hour":
+                hour, value = reporting.peak_hour_date(data, args.date, monitoring_station, pollutant)
+                rows.append([monitoring_station, pollutant, args.date, hour or None, value if hour else None])
+                continue
+            else:  # Missing data
+                rows.append([monitoring_station, pollutant, reporting.count_missing_data(data, monitoring_station,
+                                                                                         pollutant)])
+                continue
+            rows.extend([monitoring_station, pollutant, label, value if type(value) == float else None]
+                        for label, value in zip(labels, values))  # Sentinel strings become empty values
+
+    columns = {"daily-average": "date", "daily-median": "date", "hourly-average": "hour", "monthly-average": "month"}
+    if args.operation in columns:
+        return ["station", "pollutant", columns[args.operation], "value"], rows
+    if args.operation == "peak-hour":
+        return ["station", "pollutant", "date", "hour", "value"], rows
+    return ["station", "pollutant", "missing"], rows
+
+
+def run_intelligence(args, parser):
+    """
+    Runs an intelligence operation, which saves its images and text files in the working directory.
+    Parameters:
+        args (argparse.Namespace): The parsed command line arguments.
+        parser (argparse.ArgumentParser): The parser, used to report a missing map.
+    Returns:
+        A tuple of the column names and the list of result rows.
+    """
+
+    if not os.path.exists(f"data/{args.map}"):
+        parser.error(f"map data/{args.map} does not exist")
+    colour = "red" if args.operation == "red-pixels" else "cyan" if args.operation == "cyan-pixels" else args.colour
+    find_pixels = intelligence.find_red_pixels if colour == "red" else intelligence.find_cyan_pixels
+    binary_image = find_pixels(args.map, upper_threshold=args.upper_threshold, lower_threshold=args.lower_threshold)
+    if args.operation != "connected-components":
+        return ["colour", "pixels", "output"], [[colour, int(np.count_nonzero(binary_image)),
+                                                 f"map-{colour}-pixels.jpg"]]
+
+    connected_components = intelligence.detect_connected_components(binary_image)
+    components = len(np.unique(connected_components)) - 1  # Label 0 is the background
+    rows = [[colour, components, "cc-output-2a.txt"]]
+    if args.sorted:
+        intelligence.detect_connected_components_sorted(connected_components)
+        rows.extend([[colour, components, "cc-output-2b.txt"], [colour, components, "cc-top-2.jpg"]])
+    return ["colour", "components", "output"], rows
+
+
+def run_monitoring(args):
+    """
+    Runs a monitoring operation against the LondonAir API.
+    Parameters:
+        args (argparse.Namespace): The parsed command line arguments.
+    Returns:
+        A tuple of the column names and the list of result rows.
+    """
+
+    if args.operation == "site-codes":
+        site_codes = monitoring.get_site_codes(False)
+        return ["authority", "site", "code"], [[authority, site, code] for authority, sites in site_codes.items()
+                                               for site, code in sites.items()]
+    elif args.operation == "species":
+        return ["name", "code"], [list(species) for species in monitoring.get_species(code_only=False)]
+    elif args.operation == "indices":
+        df = monitoring.get_current_pollution_indices()
+        return list(df.columns), df.values.tolist()
+    elif args.operation == "trend":
+        monitoring.display_todays_trend(args.site)
+        return ["site", "output"], [[args.site, "graph.png"]]
+    elif args.operation == "map":
+        monitoring.display_map(monitoring.get_current_pollution_indices(), args.pollutant.upper())
+        return ["pollutant", "output"], [[args.pollutant.upper(), "pollution.png"]]
+    df = monitoring.get_index_health_advice()  # Health advice
+    band = [row for row in df.values.tolist() if int(row[1]) <= args.index <= int(row[2])]
+    return list(df.columns), band
+
+
+def write_results(fields, rows, output_format="csv", output=None):
+    """
+    Writes results in one pass to a file or stdout, without any colour formatting.
+    Parameters:
+        fields (list): The column names.
+        rows (list): The result rows, with None for missing values.
+        output_format (str): One of "csv", "json" or "text".
+        output (str): The file to write to. Results are written to stdout if this is None.
+    """
+
+    file = open(output, "w", newline="", buffering=OUTPUT_BUFFER_SIZE) if output else sys.stdout
+    try:
+        if output_format == "json":
+            json.dump([dict(zip(fields, row)) for row in rows], file)
+            file.write("\n")
+        elif output_format == "csv":
+            writer = csv.writer(file, lineterminator="\n")
+            writer.writerow(fields)
+            writer.writerows(rows)  # None is written as an empty field
+        else:  # Tab separated text
+            file.write("\n".join("\t".join("" if value is None else str(value) for value in row)
+                                 for row in [fields, *rows]) + "\n")
+    finally:
+        if output:
+            file.close()
+        else:
+            file.flush()
+
+
+def main(argv=None):
+    """
+    Runs a single operation from the command line, or the interactive menu when no arguments are given.
+    Parameters:
+        argv (list): The command line arguments, excluding the program name. Defaults to sys.argv.
+    """
+
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        main_menu()
+        return
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    with contextlib.redirect_stdout(sys.stderr):  # Keeps progress messages out of the results
+        if args.module == "reporting":
+            fields, rows = run_reporting(args, parser)
+        elif args.module == "intelligence":
+            fields, rows = run_intelligence(args, parser)
+        elif args.module == "import-times":
+            fields, rows = measure_import_times(args.repeats)
+        else:
+            fields, rows = run_monitoring(args)
+    try:
+        write_results(fields, rows, args.format, args.output)
+    except BrokenPipeError:  # The reader stopped early, e.g. when piped into head
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())  # Silences the flush at exit
+        sys.exit(1)
+
+
 if __name__ == '__main__':
-    main_menu()
+    main()
@@ -9,8 +9,6 @@
 #
 import pandas as pd
 import requests
-import matplotlib.pyplot as plt
-from matplotlib.patches import Circle
 import xml.etree.ElementTree as ET
 from utils import color, format_message
 import datetime
@@ -94,6 +92,8 @@ def display_todays_trend(site_code):
         site_code (str): The site for which to plot data for.
     """
 
+    import matplotlib.pyplot as plt  # Imported on first use as matplotlib is slow to load
+
     for species_code in get_species():
         today_data = get_data(site_code, species_code)  # Get data for each pollutant
         y = []
@@ -179,6 +179,9 @@ def display_map(df, pollutant):
         pollutant (str): The pollutant for which to plot the data for.
     """
 
+    import matplotlib.pyplot as plt  # Imported on first use as matplotlib is slow to load
+    from matplotlib.patches import Circle
+
     fig, ax = plt.subplots(1)  # Create a pyplot figure
     fig.subplots_adjust(left=0, right=1, bottom=0, top=1)  # Remove surrounding borders
     img = plt.imread("data/london.png")  # Read in map of london
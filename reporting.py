@@ -1,38 +1,53 @@
 # This is a template. 
 # You should modify the functions below to match
 # the signatures determined by the project specification
-from itertools import accumulate
+import glob
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+import warnings
+from collections import defaultdict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-from collections import Counter
-from utils import split, insertion_sort
+
+MISSING_DATA = "No data"  # Marker used in the csv files for hours where no value was recorded
+HOURS_PER_DAY = 24
+MIN_COVERAGE = 0.75  # Fraction of a rolling window that must hold valid readings for its statistics to be reported
+CHUNK_SIZE = 100000  # Number of csv rows held in memory at once when streaming a station
+DATA_DIRECTORY = "data"
+STATION_FILE_PREFIX = "Pollution-"
+STORE_DIRECTORY = os.path.join(DATA_DIRECTORY, "store")  # Binary copies of the station csv files
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+SEASONS = ["Winter", "Spring", "Summer", "Autumn"]  # Meteorological seasons starting in December, March, June and Sep
+MIN_PERIODS = HOURS_PER_DAY  # Hours two stations must both have readings for before they are correlated
+ANOMALY_ALPHA = 2 / (HOURS_PER_DAY + 1)  # Smoothing factor of an exponentially weighted average spanning a day
+ANOMALY_THRESHOLD = 4.0  # Number of standard deviations from the running average that flags a reading
+PERIOD_LENGTHS = {"day": 10, "month": 7, "year": 4, "all": 0}  # Length of the YYYY-MM-DD prefix naming each period
 
 
 def daily_average(data, monitoring_station, pollutant):
     """
     Calculates the average value each day for a particular pollutant and monitoring station.
     Parameters:
-        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station, or a RollupCube.
         monitoring_station (str): The name of the monitoring station.
         pollutant (str): The name of the pollutant.
     Returns:
         A list of 365 numerical values representing the average for each day of the year.
     """
 
-    station_data = data[monitoring_station]
-    pollutant_values = station_data[pollutant]
-    result = []
-
-    daily_entries = list(split(pollutant_values, 24))  # Split values into chunks of 24 hour periods
-    for day in daily_entries:
-        day_total = 0
-        filtered_day = list(filter(lambda x: x != "No data", day))  # Ignore any "No data" values
-        if len(filtered_day) == 0:
-            result.append("No data for this day")
-            continue
-        for value in filtered_day:
-            day_total += float(value)
-        result.append(day_total / len(filtered_day))
-    return result
+    rollup = get_rollup(data, monitoring_station, pollutant)
+    if rollup is not None:  # Answer from the pre-aggregated statistics instead of the readings
+        return rollup.daily_average()
+
+    daily_entries = get_day_matrix(data[monitoring_station], pollutant)  # One row of 24 hourly values per day
+    return to_report_list(nan_mean(daily_entries, axis=1), "No data for this day")
 
 
 def daily_median(data, monitoring_station, pollutant):
@@ -46,21 +61,9 @@ def daily_median(data, monitoring_station, pollutant):
         A list of 365 numerical values representing the median for each day of the year.
     """
 
-    station_data = data[monitoring_station]
-    pollutant_values = station_data[pollutant]
-    result = []
-
-    daily_entries = list(split(pollutant_values, 24))  # Split values into chunks of 24 hour periods
-    for day in daily_entries:
-        filtered_day = list(filter(lambda x: x != "No data", day))  # Ignore any "No data" values
-        if len(filtered_day) == 0:
-            result.append("No data for this day")
-            continue
-        sorted_day = insertion_sort([float(i) for i in filtered_day])  # Sort data into ascending order
-        mid = len(sorted_day) // 2
-        median = (sorted_day[mid] + sorted_day[~mid]) / 2  # Calculate average of middle values
-        result.append(median)
-    return result
+    check_readings(data, "daily_median")
+    daily_entries = get_day_matrix(data[monitoring_station], pollutant)  # One row of 24 hourly values per day
+    return to_report_list(nan_median(daily_entries, axis=1), "No data for this day")
 
 
 def hourly_average(data, monitoring_station, pollutant):
@@ -68,136 +71,2130 @@ def hourly_average(data, monitoring_station, pollutant):
     Calculates the average for each hour across all 365 days
     of the year for a particular pollutant and monitoring station.
     Parameters:
-        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station, or a RollupCube.
         monitoring_station (str): The name of the monitoring station.
         pollutant (str): The name of the pollutant.
     Returns:
         A list of 24 numerical values representing the average for each hour of a day.
     """
 
-    station_data = data[monitoring_station]
-    pollutant_values = station_data[pollutant].values
-    result = []
-
-    hourly_entries = [pollutant_values[i::24] for i in range(24)]  # Stores values for the same hour in a sublist
-    for hour in hourly_entries:
-        hour_total = 0
-        filtered_hour = list(filter(lambda x: x != "No data", hour))  # Ignore any "No data" values
-        for value in filtered_hour:
-            hour_total += float(value)
-        result.append(hour_total / len(filtered_hour))
-    return result
+    rollup = get_rollup(data, monitoring_station, pollutant)
+    if rollup is not None:  # Answer from the pre-aggregated statistics instead of the readings
+        return rollup.hourly_average()
+
+    daily_entries = get_day_matrix(data[monitoring_station], pollutant)  # Each column holds the values for the same hour
+    return to_report_list(nan_mean(daily_entries, axis=0), "No data for this hour")
 
 
 def monthly_average(data, monitoring_station, pollutant):
     """
     Calculates the average for each month of the year for a particular pollutant and monitoring station.
     Parameters:
-        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station, or a RollupCube.
         monitoring_station (str): The name of the monitoring station.
         pollutant (str): The name of the pollutant.
     Returns:
         A list of 12 numerical values representing the average for each month of the year.
     """
 
+    rollup = get_rollup(data, monitoring_station, pollutant)
+    if rollup is not None:  # Answer from the pre-aggregated statistics instead of the readings
+        return rollup.monthly_average()
+
     station_data = data[monitoring_station]
-    pollutant_values = station_data[pollutant].values
-    date_values = station_data["date"]
-    result = []
-
-    months = [date[5:7] for date in date_values]  # Stores the month number for each entry in the dataset
-    num_entries_in_month = Counter(
-        map(lambda x: int(x), months)).values()  # Counts the number of occurrences of each month in the dataset
-    monthly_entries = [pollutant_values[x - y:x] for x, y in
-                       zip(accumulate(num_entries_in_month),
-                           num_entries_in_month)]  # Splits the data based on number of entries each month
-    for month in monthly_entries:
-        month_total = 0
-        filtered_month = list(filter(lambda x: x != "No data", month))  # Ignore any "No data" values
-        if len(filtered_month) == 0:
-            result.append("No data for this month")
-            continue
-        for value in filtered_month:
-            month_total += float(value)
-        result.append(month_total / len(filtered_month))
-    return result
+    pollutant_values = get_pollutant_values(station_data, pollutant)
+
+    monthly = group_statistics(pollutant_values, get_months(station_data), 12)
+    present = monthly["rows"] > 0  # Only report months that appear in the dataset
+    return to_report_list(monthly["mean"][present], "No data for this month")
 
 
 def peak_hour_date(data, date, monitoring_station, pollutant):
     """
     Finds the hour and value at a particular monitoring station and date for which the specified pollutant is highest.
     Parameters:
-        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station, or a RollupCube.
         date (str): The date on which to find the peak value.
         monitoring_station (str): The name of the monitoring station.
         pollutant (str): The name of the pollutant.
     Returns:
-        A list of 12 numerical values representing the average for each month of the year.
+        A tuple of the hour and the peak value, or ("", 0) if there was no positive value.
     """
 
+    rollup = get_rollup(data, monitoring_station, pollutant)
+    if rollup is not None:  # Answer from the pre-aggregated statistics instead of the readings
+        return rollup.peak_hour_date(date)
+
     station_data = data[monitoring_station]
-    pollutant_values = station_data[pollutant]
+    pollutant_values = get_pollutant_values(station_data, pollutant)
 
-    date_values = station_data["date"]  # Get date column
-    hour_indices = [i for i, x in enumerate(date_values) if
-                    x == date]  # Get the indices in the dataset for all hours of the specific date
+    hour_indices = get_date_index(station_data).rows(date)  # Rows for all hours of the specific date
+    hours = get_hours(station_data.iloc[hour_indices])
     highest = ("", 0)
-    for i, j in enumerate(hour_indices):
-        if pollutant_values[j] == "No data":
+    for hour, value in zip(hours.tolist(), pollutant_values[hour_indices].tolist()):
+        if value != value:  # Skip missing (NaN) values
             continue
-        if float(pollutant_values[j]) > highest[1]:  # If greater than current greatest
-            highest = (f"{i + 1}:00", float(pollutant_values[j]))  # Store hour along with value
+        if value > highest[1]:  # If greater than current greatest
+            highest = (f"{hour + 1}:00", value)  # Store hour along with value
     return highest
 
 
-def count_missing_data(data, monitoring_station, pollutant):
+def slice_dates(data, start_date, end_date, monitoring_station):
     """
-    Counts number of occurrences of "No data" for a particular monitoring station and pollutant.
+    Gets the readings between two dates (inclusive) for a particular monitoring station.
     Parameters:
         data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        start_date (str): The first date to include (YYYY-MM-DD).
+        end_date (str): The last date to include (YYYY-MM-DD).
+        monitoring_station (str): The name of the monitoring station.
+    Returns:
+        A DataFrame of the readings in the date range, sharing memory with the station data where possible.
+    """
+
+    check_readings(data, "slice_dates")
+    station_data = data[monitoring_station]
+    return station_data.iloc[get_date_index(station_data).range(start_date, end_date)]
+
+
+def count_missing_data(data, monitoring_station, pollutant):
+    """
+    Counts number of missing data values for a particular monitoring station and pollutant.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station, or a RollupCube.
         monitoring_station (str): The name of the monitoring station.
         pollutant (str): The name of the pollutant.
     Returns:
         An integer representing the number of missing data values.
     """
 
+    rollup = get_rollup(data, monitoring_station, pollutant)
+    if rollup is not None:  # Answer from the pre-aggregated statistics instead of the readings
+        return rollup.count_missing_data()
+
+    pollutant_values = get_pollutant_values(data[monitoring_station], pollutant)
+
+    return int(np.isnan(pollutant_values).sum())  # Missing values are stored as NaN
+
+
+def gap_analysis(data, monitoring_station, pollutant):
+    """
+    Finds where the missing data is for a particular monitoring station and pollutant.
+    The readings are first aligned onto the station's hourly timeline, so hours without any row count as missing.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        monitoring_station (str): The name of the monitoring station.
+        pollutant (str): The name of the pollutant.
+    Returns:
+        A dictionary containing:
+            mask - A boolean numpy array which is True for each missing hour of the timeline.
+            missing - The number of missing hours.
+            spans - A list of (first timestamp, last timestamp, number of hours) for each gap.
+            longest_gap - The number of hours in the longest gap.
+            monthly_coverage - A dictionary mapping each month (YYYY-MM) to the fraction of hours with a reading.
+    """
+
+    check_readings(data, "gap_analysis")
     station_data = data[monitoring_station]
-    pollutant_values = station_data[pollutant]
+    positions, num_hours = get_hour_positions(station_data)
+    mask = np.isnan(align_hourly(get_pollutant_values(station_data, pollutant), positions, num_hours))
+    starts, lengths = find_runs(mask)  # Run-length encode the gaps in one pass
+    timestamps = get_timeline(station_data, num_hours)
+    months, month_keys = np.unique((timestamps - pd.Timedelta(hours=1)).strftime("%Y-%m"),
+                                   return_inverse=True)  # 24:00 belongs to the day it ends
+    coverage = 1 - np.bincount(month_keys, weights=mask, minlength=len(months)) / np.bincount(month_keys)
+    return {
+        "mask": mask,
+        "missing": int(lengths.sum()),
+        "spans": list(zip(timestamps[starts].astype(str), timestamps[starts + lengths - 1].astype(str),
+                          lengths.tolist())),
+        "longest_gap": int(lengths.max(initial=0)),
+        "monthly_coverage": dict(zip(months.tolist(), coverage.tolist())),
+    }
+
+
+def gap_analysis_all(data, pollutants=None):
+    """
+    Finds where the missing data is for every monitoring station and pollutant.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        pollutants (list): The pollutants to analyse. Defaults to every pollutant column of each station.
+    Returns:
+        A dictionary mapping each station and pollutant to the result of gap_analysis.
+    """
 
-    return len(list(
-        filter(lambda x: x == "No data", pollutant_values)))  # Filters out anything but "No data" and counts length
+    check_readings(data, "gap_analysis_all")
+    return {monitoring_station: {p: gap_analysis(data, monitoring_station, p) for p in
+                                 (get_pollutants(station_data) if pollutants is None else pollutants)}
+            for monitoring_station, station_data in data.items()}
 
 
-def fill_missing_data(data, new_value, monitoring_station, pollutant):
+def calendar_statistics(data, monitoring_station, pollutant, calendar):
     """
-    Replaces "No data" values with a specified value for a particular monitoring station and pollutant.
+    Calculates the sum, count, mean, minimum and maximum of each calendar bucket for a particular pollutant and
+    monitoring station.
     Parameters:
         data (dict): Dictionary containing pandas DataFrames for each monitoring station.
-        new_value: The value to replace the "No data".
         monitoring_station (str): The name of the monitoring station.
         pollutant (str): The name of the pollutant.
+        calendar (str): The calendar to bucket by, one of "hour", "weekday", "week", "month" or "season".
     Returns:
-        A dictionary object containing no missing data for a particular monitoring station and pollutant.
+        A DataFrame indexed by the name of each bucket found in the data, with a column for each statistic.
     """
 
+    check_readings(data, "calendar_statistics")
     station_data = data[monitoring_station]
-    pollutant_values = station_data[pollutant]
+    keys, labels = get_calendar_keys(station_data, calendar)
+    statistics = group_statistics(get_pollutant_values(station_data, pollutant), keys, len(labels))
+    present = statistics.pop("rows") > 0  # Only report buckets that appear in the dataset
+    return pd.DataFrame({name: values[present] for name, values in statistics.items()},
+                        index=pd.Index(labels)[present])
+
+
+def monthly_statistics(data, monitoring_station, pollutant):
+    """
+    Calculates the statistics of each month of the year. See calendar_statistics.
+    """
+
+    return calendar_statistics(data, monitoring_station, pollutant, "month")
+
 
-    new_pollutant_values = list(map(lambda x: new_value if x == "No data" else x,
-                                    pollutant_values))  # Maps the new value to the missing data value
-    data[monitoring_station][pollutant] = new_pollutant_values  # Replaced old data with new data
+def weekday_statistics(data, monitoring_station, pollutant):
+    """
+    Calculates the statistics of each day of the week. See calendar_statistics.
+    """
+
+    return calendar_statistics(data, monitoring_station, pollutant, "weekday")
+
+
+def weekly_statistics(data, monitoring_station, pollutant):
+    """
+    Calculates the statistics of each ISO week of the year. See calendar_statistics.
+    """
+
+    return calendar_statistics(data, monitoring_station, pollutant, "week")
+
+
+def seasonal_statistics(data, monitoring_station, pollutant):
+    """
+    Calculates the statistics of each season. See calendar_statistics.
+    """
+
+    return calendar_statistics(data, monitoring_station, pollutant, "season")
+
+
+def fill_missing_data(data, new_value, monitoring_station, pollutant, method="constant", limit=None):
+    """
+    Replaces missing data values for a particular monitoring station and pollutant.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        new_value (float): The value to replace the missing data when method is "constant".
+        monitoring_station (str): The name of the monitoring station.
+        pollutant (str): The name of the pollutant.
+        method (str): How to fill the missing data, one of "constant", "ffill", "linear" or "profile".
+        limit (int): The longest gap (in consecutive readings) to fill. Longer gaps are left missing.
+    Returns:
+        A dictionary object containing no missing data for a particular monitoring station and pollutant.
+    """
+
+    return fill_station_gaps(data, monitoring_station, method, new_value, limit, [pollutant])
+
+
+def fill_station_gaps(data, monitoring_station, method="linear", new_value=None, limit=None, pollutants=None):
+    """
+    Replaces missing data values for every pollutant of a monitoring station in one call.
+    Methods:
+        constant - Uses new_value.
+        ffill - Repeats the last valid value before the gap.
+        linear - Interpolates between the valid values either side of the gap.
+        profile - Uses the average of the same hour of the day.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        monitoring_station (str): The name of the monitoring station.
+        method (str): How to fill the missing data, one of "constant", "ffill", "linear" or "profile".
+        new_value (float): The value to replace the missing data when method is "constant".
+        limit (int): The longest gap (in consecutive readings) to fill. Longer gaps are left missing.
+        pollutants (list): The pollutants to fill. Defaults to every pollutant column.
+    Returns:
+        The data dictionary, with the missing values of the station's pollutant columns filled in place.
+    """
+
+    check_readings(data, "fill_station_gaps")
+    station_data = data[monitoring_station]
+    pollutants = get_pollutants(station_data) if pollutants is None else pollutants
+    hours = get_hours(station_data) if method == "profile" else None
+    positions = get_hour_positions(station_data)[0] if method == "linear" else None  # Interpolate by time
+    for pollutant in pollutants:  # One column at a time, writing only the filled rows
+        if not pd.api.types.is_float_dtype(station_data[pollutant].dtype):  # Raw csv columns hold "No data"
+            station_data[pollutant] = get_pollutant_values(station_data, pollutant)
+        rows, filled = gap_fill_values(get_pollutant_values(station_data, pollutant), method, new_value, limit,
+                                       hours, positions)
+        try:
+            station_data.iloc[rows, station_data.columns.get_loc(pollutant)] = filled
+        except ValueError:  # Memory-mapped columns are read-only, so only this column is copied
+            pollutant_values = get_pollutant_values(station_data, pollutant).copy()
+            pollutant_values[rows] = filled
+            station_data[pollutant] = pollutant_values
     return data
 
 
-def load_data():
+def rolling_average(data, monitoring_station, pollutant, window=8, min_coverage=MIN_COVERAGE):
+    """
+    Calculates the rolling average over the previous number of hours for a particular pollutant and monitoring station.
+    Windows are measured on the hourly timeline, so hours without a reading count as missing data.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        monitoring_station (str): The name of the monitoring station.
+        pollutant (str): The name of the pollutant.
+        window (int): The number of hours in each window, ending at the current hour.
+        min_coverage (float): The fraction of the window that must hold valid readings.
+    Returns:
+        A numpy array with the average for the window ending at each reading, or NaN where coverage is too low.
+    """
+
+    check_readings(data, "rolling_average")
+    station_data = data[monitoring_station]
+    positions, num_hours = get_hour_positions(station_data)
+    pollutant_values = align_hourly(get_pollutant_values(station_data, pollutant), positions, num_hours)
+    totals, counts = rolling_sums(pollutant_values, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return apply_coverage(totals / counts, counts, window, min_coverage)[positions]  # Value at each reading
+
+
+def rolling_max(data, monitoring_station, pollutant, window=24, min_coverage=MIN_COVERAGE):
+    """
+    Calculates the rolling maximum over the previous number of hours for a particular pollutant and monitoring station.
+    Windows are measured on the hourly timeline, so hours without a reading count as missing data.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        monitoring_station (str): The name of the monitoring station.
+        pollutant (str): The name of the pollutant.
+        window (int): The number of hours in each window, ending at the current hour.
+        min_coverage (float): The fraction of the window that must hold valid readings.
+    Returns:
+        A numpy array with the maximum for the window ending at each reading, or NaN where coverage is too low.
+    """
+
+    check_readings(data, "rolling_max")
+    station_data = data[monitoring_station]
+    positions, num_hours = get_hour_positions(station_data)
+    pollutant_values = align_hourly(get_pollutant_values(station_data, pollutant), positions, num_hours)
+    counts = rolling_sums(pollutant_values, window)[1]
+    return apply_coverage(rolling_window_max(pollutant_values, window), counts, window, min_coverage)[positions]
+
+
+def rolling_statistics(data, windows=(8, 24), pollutants=None, min_coverage=MIN_COVERAGE):
+    """
+    Calculates the rolling average and maximum for every window, monitoring station and pollutant.
+    All pollutants of a station are processed together as the columns of a single matrix.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        windows (tuple): The number of hours in each window to calculate.
+        pollutants (list): The pollutants to calculate. Defaults to every pollutant column of each station.
+        min_coverage (float): The fraction of each window that must hold valid readings.
+    Returns:
+        A dictionary mapping each station, pollutant and window to a dictionary of "average" and "max" arrays.
+    """
+
+    check_readings(data, "rolling_statistics")
+    result = {}
+    for monitoring_station, station_data in data.items():
+        station_pollutants = get_pollutants(station_data) if pollutants is None else pollutants
+        positions, num_hours = get_hour_positions(station_data)
+        pollutant_values = np.column_stack([align_hourly(get_pollutant_values(station_data, p), positions, num_hours)
+                                            for p in station_pollutants])
+        result[monitoring_station] = {p: {} for p in station_pollutants}
+        for window in windows:
+            totals, counts = rolling_sums(pollutant_values, window)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                averages = apply_coverage(totals / counts, counts, window, min_coverage)
+            maxima = apply_coverage(rolling_window_max(pollutant_values, window), counts, window, min_coverage)
+            for i, pollutant in enumerate(station_pollutants):  # Value at each reading
+                result[monitoring_station][pollutant][window] = {"average": averages[positions, i],
+                                                                 "max": maxima[positions, i]}
+    return result
+
+
+def resample_hourly(data, monitoring_station, pollutants=None):
+    """
+    Aligns the readings of a monitoring station onto a regular hourly timeline using their timestamps.
+    Hours without a reading are NaN and duplicate readings of an hour are averaged.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        monitoring_station (str): The name of the monitoring station.
+        pollutants (list): The pollutants to align. Defaults to every pollutant column.
+    Returns:
+        A DataFrame indexed by the timestamp at the end of every hour from the first to the last day.
+    """
+
+    check_readings(data, "resample_hourly")
+    station_data = data[monitoring_station]
+    pollutants = get_pollutants(station_data) if pollutants is None else pollutants
+    positions, num_hours = get_hour_positions(station_data)
+    return pd.DataFrame({p: align_hourly(get_pollutant_values(station_data, p), positions, num_hours)
+                         for p in pollutants}, index=get_timeline(station_data, num_hours))
+
+
+def align_stations(data, pollutant):
+    """
+    Aligns a pollutant from every monitoring station onto one shared hourly timeline.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        pollutant (str): The name of the pollutant.
+    Returns:
+        A DataFrame indexed by the timestamp at the end of every hour from the first to the last day of any station,
+        with one column per station that records the pollutant and NaN for hours without a reading.
+    """
+
+    check_readings(data, "align_stations")
+    stations = [s for s in data if pollutant in get_pollutants(data[s]) and len(data[s])]
+    first_days = {s: get_days(data[s]).min() for s in stations}
+    first_day = min(first_days.values()) if stations else None
+    aligned = {}
+    for monitoring_station in stations:
+        station_data = data[monitoring_station]
+        positions, num_hours = get_hour_positions(station_data)
+        offset = int((first_days[monitoring_station] - first_day).astype(np.int64)) * HOURS_PER_DAY
+        aligned[monitoring_station] = (offset, align_hourly(get_pollutant_values(station_data, pollutant),
+                                                            positions, num_hours))
+    num_hours = max((offset + len(values) for offset, values in aligned.values()), default=0)
+    station_values = np.full((num_hours, len(stations)), np.nan)
+    for column, (offset, values) in enumerate(aligned.values()):
+        station_values[offset:offset + len(values), column] = values
+    if not stations:  # No station records the pollutant
+        return pd.DataFrame(station_values, index=pd.DatetimeIndex([], dtype="datetime64[ns]", name="timestamp"))
+    first_hour = pd.Timestamp(first_day) + pd.Timedelta(hours=1)
+    return pd.DataFrame(station_values, columns=stations,
+                        index=pd.date_range(first_hour, periods=num_hours, freq="h", name="timestamp"))
+
+
+def station_correlation(data, pollutant, lag=0, min_periods=MIN_PERIODS):
+    """
+    Calculates the Pearson correlation of a pollutant between every pair of monitoring stations.
+    Each pair only uses the hours where both stations have a reading.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        pollutant (str): The name of the pollutant.
+        lag (int): The number of hours the column station is shifted by, so entry (a, b) correlates a at hour t
+            with b at hour t + lag.
+        min_periods (int): The fewest shared hours needed for a correlation. Pairs with fewer are NaN.
+    Returns:
+        A DataFrame of correlations with the stations as both the index and the columns.
+    """
+
+    return lagged_correlation(data, pollutant, [lag], min_periods)[lag]
+
+
+def lagged_correlation(data, pollutant, lags=range(-HOURS_PER_DAY, HOURS_PER_DAY + 1), min_periods=MIN_PERIODS):
+    """
+    Calculates the correlation between every pair of monitoring stations for each lag in a range.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        pollutant (str): The name of the pollutant.
+        lags (iterable): The lags in hours. Entry (a, b) of each matrix correlates a at hour t with b at hour t + lag.
+        min_periods (int): The fewest shared hours needed for a correlation. Pairs with fewer are NaN.
+    Returns:
+        A dictionary mapping each lag to a DataFrame of correlations with the stations as the index and columns.
+    """
+
+    aligned = align_stations(data, pollutant)
+    station_values = aligned.to_numpy()
+    num_hours = len(station_values)
+    result = {}
+    for lag in lags:
+        leading = station_values[max(-lag, 0):num_hours - max(lag, 0)]  # Hours t
+        lagging = station_values[max(lag, 0):num_hours - max(-lag, 0)]  # Hours t + lag
+        result[lag] = pd.DataFrame(pairwise_correlation(leading, lagging, min_periods),
+                                   index=aligned.columns, columns=aligned.columns)
+    return result
+
+
+def correlation_matrices(data, pollutants=None, min_periods=MIN_PERIODS):
+    """
+    Calculates the station correlation matrix of every pollutant.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        pollutants (list): The pollutants to correlate. Defaults to every pollutant of any station.
+        min_periods (int): The fewest shared hours needed for a correlation. Pairs with fewer are NaN.
+    Returns:
+        A dictionary mapping each pollutant to a DataFrame of correlations between the stations.
+    """
+
+    check_readings(data, "correlation_matrices")
+    if pollutants is None:
+        pollutants = list(dict.fromkeys(p for station_data in data.values() for p in get_pollutants(station_data)))
+    return {pollutant: station_correlation(data, pollutant, 0, min_periods) for pollutant in pollutants}
+
+
+def exceedances(data, thresholds, min_coverage=MIN_COVERAGE):
+    """
+    Finds when pollutants exceeded their limit values at every monitoring station.
+    Each station's pollutants are aligned onto one hourly timeline and checked together.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        thresholds (dict): Dictionary mapping each pollutant to its limits, e.g.
+            {"pm10": {"hourly": 100, "daily": 50, "rolling": {8: 60}}}, where "hourly" applies to each reading,
+            "daily" to each daily mean and "rolling" maps a window in hours to the limit for its rolling mean.
+        min_coverage (float): The fraction of a day or rolling window that must hold valid readings.
+    Returns:
+        A dictionary mapping each station, pollutant and limit ("hourly", "daily" or e.g. "rolling 8h") to a
+        dictionary with the number of exceedances, the first and last exceedance and the list of episodes.
+    """
+
+    check_readings(data, "exceedances")
+    result = {}
+    for monitoring_station, station_data in data.items():
+        pollutants = [p for p in thresholds if p in get_pollutants(station_data)]
+        positions, num_hours = get_hour_positions(station_data)
+        pollutant_values = np.column_stack([align_hourly(get_pollutant_values(station_data, p), positions, num_hours)
+                                            for p in pollutants]) if pollutants else np.zeros((num_hours, 0))
+        timeline = get_timeline(station_data, num_hours).astype(str)
+        days = timeline[::HOURS_PER_DAY].str[:10]  # The 01:00 reading starts each day
+        hourly_limits = np.array([thresholds[p].get("hourly", np.inf) for p in pollutants])
+        daily_limits = np.array([thresholds[p].get("daily", np.inf) for p in pollutants])
+        with np.errstate(invalid="ignore"):  # NaN never exceeds a limit
+            hourly_exceeded = pollutant_values > hourly_limits
+            daily_entries = pollutant_values.reshape(num_hours // HOURS_PER_DAY, HOURS_PER_DAY, len(pollutants))
+            daily_means = apply_coverage(nan_mean(daily_entries, axis=1), (~np.isnan(daily_entries)).sum(axis=1),
+                                         HOURS_PER_DAY, min_coverage)
+            daily_exceeded = daily_means > daily_limits
+
+        result[monitoring_station] = {}
+        for i, pollutant in enumerate(pollutants):
+            limits = thresholds[pollutant]
+            summary = {}
+            if "hourly" in limits:
+                summary["hourly"] = exceedance_summary(hourly_exceeded[:, i], timeline)
+            if "daily" in limits:
+                summary["daily"] = exceedance_summary(daily_exceeded[:, i], days)
+            for window, limit in limits.get("rolling", {}).items():
+                totals, counts = rolling_sums(pollutant_values[:, i], window)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    rolling_means = apply_coverage(totals / counts, counts, window, min_coverage)
+                    summary[f"rolling {window}h"] = exceedance_summary(rolling_means > limit, timeline)
+            result[monitoring_station][pollutant] = summary
+    return result
+
+
+def report_cube(data, pollutants=None, workers=None):
+    """
+    Calculates every report statistic for every monitoring station and pollutant.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        pollutants (list): The pollutants to report on. Defaults to every pollutant column of each station.
+        workers (int): The number of processes to share the stations between. Runs in this process if None.
+    Returns:
+        A dictionary mapping each station to a dictionary of reports for each of its pollutants.
+    """
+
+    check_readings(data, "report_cube")
+    stations = list(data.keys())
+    if workers is None:
+        reports = [station_report(data[station], pollutants) for station in stations]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:  # Stations are independent of each other
+            reports = list(executor.map(station_report, [data[station] for station in stations],
+                                        [pollutants] * len(stations)))
+    return dict(zip(stations, reports))
+
+
+def station_report(station_data, pollutants=None):
+    """
+    Calculates every report statistic for the pollutants of a single monitoring station.
+    The hourly timeline and months are only calculated once and shared between every statistic and pollutant.
+    Parameters:
+        station_data (pandas.DataFrame): The data for a single monitoring station.
+        pollutants (list): The pollutants to report on. Defaults to every pollutant column.
+    Returns:
+        A dictionary mapping each pollutant to a dictionary with the daily average, daily median, hourly average,
+        monthly average, missing data count and daily peaks.
+    """
+
+    pollutants = get_pollutants(station_data) if pollutants is None else pollutants
+    months = get_months(station_data)  # Grouping shared by every pollutant
+    present = np.bincount(months, minlength=12) > 0
+
+    report = {}
+    positions, num_hours = get_hour_positions(station_data)  # Timeline shared by every pollutant
+    for pollutant in pollutants:
+        pollutant_values = get_pollutant_values(station_data, pollutant)
+        daily_entries = day_matrix(align_hourly(pollutant_values, positions, num_hours))  # Shared by every statistic
+        report[pollutant] = {
+            "daily_average": to_report_list(nan_mean(daily_entries, axis=1), "No data for this day"),
+            "daily_median": to_report_list(nan_median(daily_entries, axis=1), "No data for this day"),
+            "hourly_average": to_report_list(nan_mean(daily_entries, axis=0), "No data for this hour"),
+            "monthly_average": to_report_list(group_statistics(pollutant_values, months, 12)["mean"][present],
+                                              "No data for this month"),
+            "missing_data": int(np.isnan(pollutant_values).sum()),
+            "daily_peak": daily_peaks(daily_entries),
+        }
+    return report
+
+
+def stream_report(filename, pollutants=None, chunk_size=CHUNK_SIZE):
+    """
+    Calculates the daily, hourly, monthly and peak reports for a station csv file without loading it into memory.
+    Parameters:
+        filename (str): The path of the csv file.
+        pollutants (list): The pollutants to report on. Defaults to every pollutant column.
+        chunk_size (int): The number of rows read from the file at a time.
+    Returns:
+        A dictionary mapping each pollutant to a StreamingReport holding its results.
+    """
+
+    reports = None
+    for chunk in read_station_chunks(filename, chunk_size):
+        if reports is None:  # Pollutant columns are only known once the first chunk has been read
+            reports = {p: StreamingReport(p) for p in (get_pollutants(chunk) if pollutants is None else pollutants)}
+        for report in reports.values():
+            report.update(chunk)
+    return reports
+
+
+def stream_quantiles(filename, pollutants=None, granularity="day", chunk_size=CHUNK_SIZE, relative_accuracy=0.01):
+    """
+    Builds a quantile sketch for each period of a station csv file in a single pass without loading it into memory.
+    Parameters:
+        filename (str): The path of the csv file.
+        pollutants (list): The pollutants to sketch. Defaults to every pollutant column.
+        granularity (str): The length of each period, one of "day", "month", "year" or "all".
+        chunk_size (int): The number of rows read from the file at a time.
+        relative_accuracy (float): The maximum relative error of each quantile.
+    Returns:
+        A dictionary mapping each pollutant to a dictionary of QuantileSketch objects for each period.
+    """
+
+    sketches = None
+    for chunk in read_station_chunks(filename, chunk_size):
+        if sketches is None:
+            sketches = {p: {} for p in (get_pollutants(chunk) if pollutants is None else pollutants)}
+        for pollutant, period_sketches in sketches.items():
+            add_to_sketches(period_sketches, get_pollutant_values(chunk, pollutant), get_periods(chunk, granularity),
+                            relative_accuracy)
+    return sketches
+
+
+def detect_anomalies(data, monitoring_station, pollutant, alpha=ANOMALY_ALPHA, threshold=ANOMALY_THRESHOLD,
+                     warmup=HOURS_PER_DAY):
+    """
+    Flags readings that are far from the exponentially weighted average of the readings before them.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        monitoring_station (str): The name of the monitoring station.
+        pollutant (str): The name of the pollutant.
+        alpha (float): The weight of each new reading in the running average and variance.
+        threshold (float): The z-score above which a reading is flagged.
+        warmup (int): The number of valid readings seen before any reading is flagged.
+    Returns:
+        A DataFrame indexed by the timestamp of each flagged reading with its "value" and "score".
+    """
+
+    check_readings(data, "detect_anomalies")
+    detector = AnomalyDetector(pollutant, alpha, threshold, warmup)
+    detector.update(data[monitoring_station])
+    return detector.anomaly_table()
+
+
+def stream_anomalies(filename, pollutants=None, chunk_size=CHUNK_SIZE, alpha=ANOMALY_ALPHA,
+                     threshold=ANOMALY_THRESHOLD, warmup=HOURS_PER_DAY):
+    """
+    Flags anomalous readings in a station csv file without loading it into memory.
+    Parameters:
+        filename (str): The path of the csv file.
+        pollutants (list): The pollutants to check. Defaults to every pollutant column.
+        chunk_size (int): The number of rows read from the file at a time.
+        alpha (float): The weight of each new reading in the running average and variance.
+        threshold (float): The z-score above which a reading is flagged.
+        warmup (int): The number of valid readings seen before any reading is flagged.
+    Returns:
+        A dictionary mapping each pollutant to an AnomalyDetector, which can keep being updated with new readings.
+    """
+
+    detectors = None
+    for chunk in read_station_chunks(filename, chunk_size):
+        if detectors is None:
+            detectors = {p: AnomalyDetector(p, alpha, threshold, warmup)
+                         for p in (get_pollutants(chunk) if pollutants is None else pollutants)}
+        for detector in detectors.values():
+            detector.update(chunk)
+    return detectors
+
+
+def station_quantiles(data, monitoring_station, pollutant, granularity="month", quantiles=(0.5, 0.95, 0.99)):
+    """
+    Estimates quantiles of each period for a particular pollutant and monitoring station.
+    Parameters:
+        data (dict): Dictionary containing pandas DataFrames for each monitoring station.
+        monitoring_station (str): The name of the monitoring station.
+        pollutant (str): The name of the pollutant.
+        granularity (str): The length of each period, one of "day", "month", "year" or "all".
+        quantiles (tuple): The quantiles to estimate, between 0 and 1.
+    Returns:
+        A dictionary mapping each period to a list of the estimated quantiles.
+    """
+
+    check_readings(data, "station_quantiles")
+    station_data = data[monitoring_station]
+    sketches = {}
+    add_to_sketches(sketches, get_pollutant_values(station_data, pollutant), get_periods(station_data, granularity))
+    return quantile_table(sketches, quantiles)
+
+
+def combine_sketches(sketches, granularity):
+    """
+    Merges the sketches of shorter periods into sketches for longer periods, e.g. days into months.
+    Parameters:
+        sketches (dict): Dictionary mapping each period (YYYY-MM-DD prefix) to a QuantileSketch.
+        granularity (str): The length of the combined periods, one of "day", "month", "year" or "all".
+    Returns:
+        A dictionary mapping each combined period to a new QuantileSketch.
+    """
+
+    length = PERIOD_LENGTHS[granularity]
+    combined = {}
+    for period, sketch in sorted(sketches.items()):
+        key = period[:length] if length else "all"
+        if key not in combined:
+            combined[key] = QuantileSketch(sketch.relative_accuracy)
+        combined[key].merge(sketch)
+    return combined
+
+
+def quantile_table(sketches, quantiles=(0.5, 0.95, 0.99)):
     """
-    Loads the csv files into a dictionary of Pandas Dataframes.
+    Estimates quantiles from each sketch.
+    Parameters:
+        sketches (dict): Dictionary mapping each period to a QuantileSketch.
+        quantiles (tuple): The quantiles to estimate, between 0 and 1.
     Returns:
-        A dictionary containing three dataframes - one for each csv.
+        A dictionary mapping each period to a list of the estimated quantiles.
+    """
+
+    return {period: [sketch.quantile(q) for q in quantiles] for period, sketch in sorted(sketches.items())}
+
+
+def build_rollup(station_files=None, chunk_size=CHUNK_SIZE):
     """
+    Builds a RollupCube by streaming the station csv files.
+    Parameters:
+        station_files (dict): Dictionary mapping each monitoring station to its csv file. Defaults to every station
+            file in the data directory.
+        chunk_size (int): The number of rows read from each file at a time.
+    Returns:
+        A RollupCube holding the statistics of every station and pollutant.
+    """
+
+    rollup_cube = RollupCube()
+    station_files = discover_stations() if station_files is None else station_files
+    for monitoring_station, filename in station_files.items():
+        rollup_cube.update_from_csv(monitoring_station, filename, chunk_size)
+    return rollup_cube
+
+
+def load_data(dtype=np.float64, directory=DATA_DIRECTORY, workers=None, store_directory=None):
+    """
+    Loads the station csv files into a dictionary of Pandas Dataframes.
+    Stations are loaded the first time they are used unless workers is given.
+    Parameters:
+        dtype (numpy.dtype): The floating point type used to store the pollutant values.
+        directory (str): The directory containing the Pollution-*.csv files.
+        workers (int): The number of threads used to load every station straight away.
+        store_directory (str): If given, stations are memory-mapped from binary copies kept in this directory
+            instead of being parsed from the csv files.
+    Returns:
+        A StationRegistry mapping each station name to its DataFrame.
+    """
+
+    registry = StationRegistry(directory, dtype, store_directory)
+    if workers is not None:
+        registry.load_all(workers)
+    return registry
+
+
+def discover_stations(directory=DATA_DIRECTORY):
+    """
+    Finds every station csv file in a directory.
+    Parameters:
+        directory (str): The directory containing the Pollution-*.csv files.
+    Returns:
+        A dictionary mapping each station name to the path of its csv file, sorted by file name.
+    """
+
+    stations = {}
+    for filename in sorted(glob.glob(os.path.join(directory, f"{STATION_FILE_PREFIX}*.csv"))):
+        stations[station_name(filename)] = filename
+    return stations
+
+
+def station_name(filename):
+    """
+    Gets the name of a station from the name of its csv file.
+    Parameters:
+        filename (str): The path of the csv file, e.g. data/Pollution-London Harlington.csv.
+    Returns:
+        The station name, e.g. Harlington.
+    """
+
+    name = os.path.splitext(os.path.basename(filename))[0][len(STATION_FILE_PREFIX):]
+    if name.startswith("London "):  # London stations have always been referred to without the city
+        name = name[len("London "):]
+    return name
+
+
+def load_station(filename, dtype=np.float64):
+    """
+    Loads a single monitoring station csv file into a Pandas DataFrame with numerical pollutant columns.
+    Parameters:
+        filename (str): The path of the csv file.
+        dtype (numpy.dtype): The floating point type used to store the pollutant values.
+    Returns:
+        A DataFrame indexed by the timestamp of each reading, where missing data is stored as NaN.
+    """
+
+    column_types = defaultdict(lambda: dtype, date=str, time=str)  # Every column except date and time is a pollutant
+    station_data = pd.read_csv(filename, na_values=[MISSING_DATA], dtype=column_types)
+    station_data.index = parse_timestamps(station_data["date"], station_data["time"])
+    get_date_index(station_data)  # Built once here so date lookups never need to scan the data
+    return station_data
+
+
+def import_station(filename, store_directory=STORE_DIRECTORY, dtype=np.float64):
+    """
+    Converts a station csv file into the binary store, with one fixed-width .npy file for the timestamps and
+    one for each pollutant, plus a manifest recording which version of the csv file they were made from.
+    Each import writes its files into a new directory and then swaps the manifest over to it, so stations that are
+    already open keep mapping the files of the previous import instead of seeing them change underneath them.
+    Parameters:
+        filename (str): The path of the csv file.
+        store_directory (str): The directory of the binary store.
+        dtype (numpy.dtype): The floating point type used to store the pollutant values.
+    Returns:
+        The directory holding the station's binary files.
+    """
+
+    station_data = load_station(filename, dtype)
+    station_directory = os.path.join(store_directory, station_name(filename))
+    os.makedirs(station_directory, exist_ok=True)
+    version_directory = tempfile.mkdtemp(prefix="version-", dir=station_directory)
+    np.save(os.path.join(version_directory, "timestamps.npy"), get_timestamps(station_data).to_numpy())
+    pollutants = get_pollutants(station_data)
+    for pollutant in pollutants:
+        np.save(os.path.join(version_directory, f"{pollutant}.npy"), get_pollutant_values(station_data, pollutant))
+    manifest = {"source": os.path.abspath(filename), "pollutants": pollutants, "dtype": np.dtype(dtype).name,
+                "version": os.path.basename(version_directory), **source_version(filename)}
+    manifest_file = os.path.join(version_directory, "manifest.json")
+    with open(manifest_file, "w") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_file, os.path.join(station_directory, "manifest.json"))  # Swapped in once every file is written
+
+    for entry in os.listdir(station_directory):  # Old imports. Mapped files stay readable after being unlinked
+        if entry.startswith("version-") and entry != manifest["version"]:
+            shutil.rmtree(os.path.join(station_directory, entry), ignore_errors=True)
+    return station_directory
+
+
+def open_station(station_directory):
+    """
+    Opens a station from the binary store. The pollutant columns are memory-mapped rather than read, so opening is
+    near-instant and processes opening the same station share its pages.
+    Parameters:
+        station_directory (str): The directory holding the station's binary files.
+    Returns:
+        A DataFrame indexed by timestamp with read-only pollutant columns, in the same format as load_station
+        except that there are no date and time columns.
+    """
+
+    while True:
+        with open(os.path.join(station_directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        version_directory = os.path.join(station_directory, manifest.get("version", ""))
+        try:
+            timestamps = np.load(os.path.join(version_directory, "timestamps.npy"), mmap_mode="r")
+            columns = {p: np.load(os.path.join(version_directory, f"{p}.npy"), mmap_mode="r")
+                       for p in manifest["pollutants"]}
+            break
+        except FileNotFoundError:  # Re-imported since the manifest was read, so read the new manifest
+            continue
+    station_data = pd.DataFrame(columns, index=pd.DatetimeIndex(timestamps, name="timestamp"), copy=False)
+    get_date_index(station_data)
+    return station_data
+
+
+def load_binary_station(filename, store_directory=STORE_DIRECTORY, dtype=np.float64):
+    """
+    Opens a station from the binary store, importing it first if it is missing, the csv file has changed or it was
+    stored with a different dtype.
+    Parameters:
+        filename (str): The path of the csv file.
+        store_directory (str): The directory of the binary store.
+        dtype (numpy.dtype): The floating point type used to store the pollutant values.
+    Returns:
+        A DataFrame in the same format as open_station.
+    """
+
+    station_directory = os.path.join(store_directory, station_name(filename))
+    if is_stale(station_directory, filename, dtype):
+        import_station(filename, store_directory, dtype)
+    return open_station(station_directory)
+
+
+def is_stale(station_directory, filename, dtype=None):
+    """
+    Checks whether a station in the binary store is missing or out of date with its csv file.
+    Parameters:
+        station_directory (str): The directory holding the station's binary files.
+        filename (str): The path of the csv file.
+        dtype (numpy.dtype): If given, the station is also stale when it was stored with a different dtype.
+    Returns:
+        True if the station needs to be imported again.
+    """
+
+    try:
+        with open(os.path.join(station_directory, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):  # Never imported or the import did not finish
+        return True
+    if dtype is not None and manifest.get("dtype") != np.dtype(dtype).name:
+        return True
+    version = source_version(filename)
+    return any(manifest.get(key) != value for key, value in version.items())
+
+
+def source_version(filename):
+    """
+    Gets the size and modification time of a csv file, used to detect when it changes.
+    Parameters:
+        filename (str): The path of the csv file.
+    Returns:
+        A dictionary with the size and modification time in nanoseconds.
+    """
+
+    stat = os.stat(filename)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def read_station_chunks(filename, chunk_size=CHUNK_SIZE, dtype=np.float64, skip_rows=0):
+    """
+    Reads a monitoring station csv file in fixed size chunks so that only one chunk is held in memory at a time.
+    Parameters:
+        filename (str): The path of the csv file.
+        chunk_size (int): The number of rows in each chunk.
+        dtype (numpy.dtype): The floating point type used to store the pollutant values.
+        skip_rows (int): The number of readings at the start of the file to skip.
+    Returns:
+        A generator of DataFrames in the same format as load_station.
+    """
+
+    column_types = defaultdict(lambda: dtype, date=str, time=str)
+    with pd.read_csv(filename, na_values=[MISSING_DATA], dtype=column_types, chunksize=chunk_size,
+                     skiprows=range(1, skip_rows + 1)) as reader:  # Keep the header row
+        for chunk in reader:
+            chunk.index = parse_timestamps(chunk["date"], chunk["time"])
+            yield chunk
+
+
+def parse_timestamps(date_values, time_values):
+    """
+    Combines the date and time columns into a single index of timestamps.
+    Parameters:
+        date_values (pandas.Series): The date of each reading (YYYY-MM-DD).
+        time_values (pandas.Series): The time of each reading (HH:MM:SS), where 24:00:00 ends the day.
+    Returns:
+        A pandas DatetimeIndex containing the timestamp of each reading.
+    """
+
+    timestamps = pd.to_datetime(date_values, format="%Y-%m-%d") + pd.to_timedelta(
+        time_values)  # Timedeltas allow the 24:00:00 reading to roll over into the next day
+    return pd.DatetimeIndex(timestamps, name="timestamp")
+
+
+def get_timestamps(station_data):
+    """
+    Gets the timestamp of each reading for a monitoring station.
+    Parameters:
+        station_data (pandas.DataFrame): The data for a single monitoring station.
+    Returns:
+        A pandas DatetimeIndex containing the timestamp of each reading.
+    """
+
+    if isinstance(station_data.index, pd.DatetimeIndex):  # Already parsed by load_station
+        return station_data.index
+    return parse_timestamps(station_data["date"], station_data["time"])
+
+
+def get_pollutant_values(station_data, pollutant):
+    """
+    Gets the values of a pollutant as a contiguous array of floats.
+    Parameters:
+        station_data (pandas.DataFrame): The data for a single monitoring station.
+        pollutant (str): The name of the pollutant.
+    Returns:
+        A 1D numpy array of floats where NaN represents missing data.
+    """
+
+    pollutant_values = station_data[pollutant]
+    if not pd.api.types.is_float_dtype(pollutant_values.dtype):  # Raw csv columns still contain "No data" strings
+        pollutant_values = pd.to_numeric(pollutant_values, errors="coerce").astype(np.float64)
+    return np.ascontiguousarray(pollutant_values.to_numpy())
+
+
+def get_rollup(data, monitoring_station, pollutant):
+    """
+    Gets the pre-aggregated statistics for a station and pollutant when the data passed in is a RollupCube.
+    Parameters:
+        data (dict/RollupCube): The loaded data or a RollupCube.
+        monitoring_station (str): The name of the monitoring station.
+        pollutant (str): The name of the pollutant.
+    Returns:
+        A StreamingReport, or None if the data is not a RollupCube.
+    """
+
+    if isinstance(data, RollupCube):
+        return data.reports[monitoring_station][pollutant]
+    return None
+
+
+def check_readings(data, function):
+    """
+    Checks that the data holds the station readings, as a RollupCube only holds the totals used by daily_average,
+    hourly_average, monthly_average, peak_hour_date and count_missing_data.
+    Parameters:
+        data (dict/RollupCube): The loaded data or a RollupCube.
+        function (str): The name of the reporting function, used in the error message.
+    """
+
+    if isinstance(data, RollupCube):
+        raise TypeError(f"{function} needs the station readings and does not support a RollupCube, use load_data")
+
+
+def get_days(station_data):
+    """
+    Gets the day that each reading belongs to for a monitoring station.
+    Readings are labelled by the end of the hour they cover, so 24:00:00 belongs to the day it ends.
+    Parameters:
+        station_data (pandas.DataFrame): The data for a single monitoring station.
+    Returns:
+        A 1D numpy array of datetime64 days.
+    """
+
+    timestamps = get_timestamps(station_data) - pd.Timedelta(hours=1)  # Shift to the start of each hour
+    return timestamps.to_numpy().astype("datetime64[D]")
+
+
+def get_hours(station_data):
+    """
+    Gets the hour of the day that each reading belongs to for a monitoring station.
+    Parameters:
+        station_data (pandas.DataFrame): The data for a single monitoring station.
+    Returns:
+        A 1D numpy array of integers from 0 (the hour ending 01:00) to 23 (the hour ending 24:00).
+    """
+
+    return (get_timestamps(station_data) - pd.Timedelta(hours=1)).hour.to_numpy()
+
+
+def get_hour_positions(station_data):
+    """
+    Gets the position of each reading on a regular hourly timeline that starts at the first hour of the first day.
+    Parameters:
+        station_data (pandas.DataFrame): The data for a single monitoring station.
+    Returns:
+        A tuple (positions, num_hours) of the position of each reading and the length of the timeline,
+        which always covers whole days.
+    """
+
+    if len(station_data) == 0:
+        return np.zeros(0, dtype=np.int64), 0
+    starts = (get_timestamps(station_data) - pd.Timedelta(hours=1)).to_numpy().astype("datetime64[h]")
+    positions = (starts - starts.min().astype("datetime64[D]")).astype(np.int64)
+    return positions, (int(positions.max()) // HOURS_PER_DAY + 1) * HOURS_PER_DAY
+
+
+def get_timeline(station_data, num_hours):
+    """
+    Gets the timestamps of the regular hourly timeline used by get_hour_positions.
+    Parameters:
+        station_data (pandas.DataFrame): The data for a single monitoring station.
+        num_hours (int): The length of the timeline.
+    Returns:
+        A pandas DatetimeIndex of the timestamp at the end of each hour.
+    """
+
+    if num_hours == 0:  # No readings
+        return pd.DatetimeIndex([], dtype="datetime64[ns]", name="timestamp")
+    first_hour = pd.Timestamp(get_days(station_data).min()) + pd.Timedelta(hours=1)
+    return pd.date_range(first_hour, periods=num_hours, freq="h", name="timestamp")
+
+
+def get_day_matrix(station_data, pollutant):
+    """
+    Gets the values of a pollutant as a matrix with one row per calendar day and one column per hour.
+    Parameters:
+        station_data (pandas.DataFrame): The data for a single monitoring station.
+        pollutant (str): The name of the pollutant.
+    Returns:
+        A numpy array of shape (days, 24), with NaN for hours without a reading.
+    """
+
+    positions, num_hours = get_hour_positions(station_data)
+    return day_matrix(align_hourly(get_pollutant_values(station_data, pollutant), positions, num_hours))
+
+
+def get_date_index(station_data):
+    """
+    Gets the index from each day to its rows for a monitoring station, building it if it is missing or out of date.
+    The index is kept in the DataFrame's attrs and rebuilt whenever the rows of the DataFrame change.
+    Parameters:
+        station_data (pandas.DataFrame): The data for a single monitoring station.
+    Returns:
+        A DateIndex for the station.
+    """
+
+    date_index = station_data.attrs.get("date_index")
+    if date_index is None or date_index.source is not station_data.index:  # Rows have been replaced or sliced
+        date_index = DateIndex(station_data)
+        station_data.attrs["date_index"] = date_index
+    return date_index
+
+
+def get_months(station_data):
+    """
+    Gets the month of the year that each reading belongs to for a monitoring station.
+    Parameters:
+        station_data (pandas.DataFrame): The data for a single monitoring station.
+    Returns:
+        A 1D numpy array of integers from 0 (January) to 11 (December).
+    """
+
+    return get_days(station_data).astype("datetime64[M]").astype(np.int64) % 12
+
+
+def get_calendar_keys(station_data, calendar):
+    """
+    Maps each reading of a monitoring station to an integer calendar bucket.
+    Parameters:
+        station_data (pandas.DataFrame): The data for a single monitoring station.
+        calendar (str): The calendar to bucket by, one of "hour", "weekday", "week", "month" or "season".
+    Returns:
+        A tuple (keys, labels) of the bucket number of each reading and the name of each bucket.
+    """
+
+    if calendar == "hour":
+        return get_hours(station_data), [f"{hour + 1}:00" for hour in range(HOURS_PER_DAY)]
+    days = get_days(station_data)
+    if calendar == "weekday":
+        return (days.astype(np.int64) + 3) % 7, WEEKDAYS  # 1970-01-01 was a Thursday
+    if calendar == "week":
+        weeks = pd.DatetimeIndex(days).isocalendar().week.to_numpy(dtype=np.int64) - 1
+        return weeks, [f"W{week:02}" for week in range(1, 54)]  # ISO weeks 1 to 53
+    months = days.astype("datetime64[M]").astype(np.int64) % 12
+    if calendar == "month":
+        return months, MONTHS
+    if calendar == "season":
+        return (months + 1) % 12 // 3, SEASONS  # December starts winter
+    raise ValueError(f"Unknown calendar: {calendar}")
+
+
+def get_pollutants(station_data):
+    """
+    Gets the names of the pollutant columns for a monitoring station.
+    Parameters:
+        station_data (pandas.DataFrame): The data for a single monitoring station.
+    Returns:
+        A list of pollutant names.
+    """
+
+    return [column for column in station_data.columns if column not in ("date", "time")]
+
+
+def align_hourly(pollutant_values, positions, num_hours):
+    """
+    Places values onto a regular hourly timeline, averaging duplicates and leaving absent hours as NaN.
+    Parameters:
+        pollutant_values (numpy.ndarray): The value of each reading.
+        positions (numpy.ndarray): The position of each reading on the timeline, from get_hour_positions.
+        num_hours (int): The length of the timeline.
+    Returns:
+        A 1D numpy array of length num_hours. The values are returned unchanged if they are already regular.
+    """
+
+    if len(positions) == num_hours and (len(positions) == 0 or positions[0] == 0) and (
+            np.diff(positions) == 1).all():  # Already one reading per hour in order
+        return pollutant_values
+    valid = ~np.isnan(pollutant_values)
+    totals = np.bincount(positions[valid], weights=pollutant_values[valid], minlength=num_hours)
+    counts = np.bincount(positions[valid], minlength=num_hours)
+    with np.errstate(invalid="ignore", divide="ignore"):  # 0 / 0 gives NaN for absent hours
+        return totals / counts
+
+
+def day_matrix(pollutant_values):
+    """
+    Reshapes a regular hourly series into a matrix with one row per day and one column per hour.
+    Parameters:
+        pollutant_values (numpy.ndarray): The hourly values, starting at the first hour of a day.
+    Returns:
+        A numpy array of shape (days, 24). An incomplete final day is padded with NaN.
+    """
+
+    num_days = -(-len(pollutant_values) // HOURS_PER_DAY)  # Round up to include a partial final day
+    padding = num_days * HOURS_PER_DAY - len(pollutant_values)
+    if padding:
+        pollutant_values = np.concatenate([pollutant_values, np.full(padding, np.nan, dtype=pollutant_values.dtype)])
+    return pollutant_values.reshape(num_days, HOURS_PER_DAY)  # A view when no padding is needed
+
+
+def nan_mean(values, axis):
+    """
+    Calculates the mean along an axis ignoring NaN, returning NaN where there are no valid values.
+    Parameters:
+        values (numpy.ndarray): The array to average.
+        axis (int): The axis along which to average.
+    Returns:
+        A numpy array of float64 means.
+    """
+
+    valid = ~np.isnan(values)
+    totals = np.where(valid, values, 0).sum(axis=axis, dtype=np.float64)
+    counts = valid.sum(axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):  # 0 / 0 gives NaN for empty rows
+        return totals / counts
+
+
+def nan_median(values, axis):
+    """
+    Calculates the median along an axis ignoring NaN, returning NaN where there are no valid values.
+    Parameters:
+        values (numpy.ndarray): The array to find the median of.
+        axis (int): The axis along which to find the median.
+    Returns:
+        A numpy array of float64 medians.
+    """
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN rows are expected for days without data
+        return np.nanmedian(values.astype(np.float64, copy=False), axis=axis)
+
+
+def group_statistics(values, keys, num_groups):
+    """
+    Calculates the sum, count, mean, minimum and maximum of the values in each group ignoring NaN,
+    with a single vectorised pass per statistic.
+    Parameters:
+        values (numpy.ndarray): The values to group.
+        keys (numpy.ndarray): The group number of each value, from 0 to num_groups - 1.
+        num_groups (int): The number of groups.
+    Returns:
+        A dictionary of numpy arrays with the "sum", "count", "mean", "min" and "max" of each group, and the number
+        of "rows" including missing values. The mean, min and max are NaN for groups without any valid values.
+    """
+
+    valid = ~np.isnan(values)
+    valid_keys = keys[valid]
+    valid_values = values[valid]
+    totals = np.bincount(valid_keys, weights=valid_values, minlength=num_groups)
+    counts = np.bincount(valid_keys, minlength=num_groups)
+    minimums = np.full(num_groups, np.inf)
+    np.minimum.at(minimums, valid_keys, valid_values)
+    maximums = np.full(num_groups, -np.inf)
+    np.maximum.at(maximums, valid_keys, valid_values)
+    no_data = counts == 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = totals / counts
+    return {"sum": totals, "count": counts, "mean": means, "min": np.where(no_data, np.nan, minimums),
+            "max": np.where(no_data, np.nan, maximums), "rows": np.bincount(keys, minlength=num_groups)}
+
+
+def pairwise_correlation(x, y, min_periods=MIN_PERIODS):
+    """
+    Calculates the Pearson correlation between every column of x and every column of y ignoring NaN pairwise,
+    using matrix products over the rows where both columns are valid.
+    Parameters:
+        x (numpy.ndarray): A 2D array with one column per series.
+        y (numpy.ndarray): A 2D array with the same number of rows as x.
+        min_periods (int): The fewest shared valid rows needed for a correlation.
+    Returns:
+        A 2D numpy array where entry (i, j) is the correlation between x[:, i] and y[:, j], or NaN if they share
+        fewer than min_periods valid rows or either is constant over those rows.
+    """
+
+    x_valid = ~np.isnan(x)
+    y_valid = ~np.isnan(y)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # Columns without any valid values
+        x = np.where(x_valid, x - np.nanmean(x, axis=0), 0)  # Centred to keep the sums of squares accurate
+        y = np.where(y_valid, y - np.nanmean(y, axis=0), 0)
+    x_mask = x_valid.astype(np.float64)
+    y_mask = y_valid.astype(np.float64)
+    counts = x_mask.T @ y_mask  # Rows where both series are valid
+    x_sums = x.T @ y_mask  # Sum of x over the rows shared with each y
+    y_sums = x_mask.T @ y
+    x_squares = (x * x).T @ y_mask
+    y_squares = x_mask.T @ (y * y)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        covariance = x.T @ y - x_sums * y_sums / counts
+        x_variance = x_squares - x_sums * x_sums / counts
+        y_variance = y_squares - y_sums * y_sums / counts
+        correlation = covariance / np.sqrt(x_variance * y_variance)
+    correlation[(counts < max(min_periods, 2)) | (x_variance <= 0) | (y_variance <= 0)] = np.nan
+    return np.clip(correlation, -1, 1)
+
+
+def ewma_scores(values, alpha, mean=np.nan, variance=0.0):
+    """
+    Calculates the z-score of each value against the exponentially weighted mean and variance of the values before it.
+    Both recurrences are evaluated by pandas' compiled ewm, continuing from a previous mean and variance.
+    Parameters:
+        values (numpy.ndarray): The values, without NaN.
+        alpha (float): The weight of each new value.
+        mean (float): The running mean before the first value, or NaN to start from the first value.
+        variance (float): The running variance before the first value.
+    Returns:
+        A tuple of the z-scores (NaN while the variance is 0), the final mean and the final variance.
+    """
+
+    if len(values) == 0:
+        return np.zeros(0), mean, variance
+    if np.isnan(mean):
+        mean = values[0]
+    # Prepending the previous state makes ewm(adjust=False) continue the recurrence m = (1 - alpha) * m + alpha * x
+    means = pd.Series(np.concatenate(([mean], values))).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    deviations = values - means[:-1]
+    variances = pd.Series(np.concatenate(([variance], (1 - alpha) * deviations ** 2))).ewm(
+        alpha=alpha, adjust=False).mean().to_numpy()  # v = (1 - alpha) * (v + alpha * deviation ** 2)
+    previous_variances = variances[:-1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = np.where(previous_variances > 0, deviations / np.sqrt(previous_variances), np.nan)
+    return scores, means[-1], variances[-1]
+
+
+def daily_peaks(daily_entries):
+    """
+    Finds the peak hour and value of each day in the same format as peak_hour_date.
+    Parameters:
+        daily_entries (numpy.ndarray): A matrix of shape (days, 24) of hourly values.
+    Returns:
+        A list of (hour, value) tuples, with ("", 0) for days without a positive value.
+    """
+
+    peaks = np.where(np.isnan(daily_entries), -np.inf, daily_entries)  # Missing hours can never be the peak
+    hours = peaks.argmax(axis=1)  # The first hour is kept when values are equal
+    values = peaks[np.arange(len(peaks)), hours]
+    return [(f"{hour + 1}:00", value) if value > 0 else ("", 0) for hour, value in zip(hours.tolist(),
+                                                                                     values.tolist())]
+
+
+def find_runs(mask):
+    """
+    Run-length encodes the runs of True values in a boolean array.
+    Parameters:
+        mask (numpy.ndarray): A 1D boolean array.
+    Returns:
+        A tuple of numpy arrays (starts, lengths) giving the first index and length of each run.
+    """
+
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))  # 1 where a run starts, -1 after it ends
+    starts = np.flatnonzero(edges == 1)
+    return starts, np.flatnonzero(edges == -1) - starts
+
+
+def fill_gaps(values, method, new_value=None, limit=None, hours=None, positions=None):
+    """
+    Fills NaN gaps in place, treating each column as a separate series.
+    Parameters:
+        values (numpy.ndarray): A 1D array, or a 2D array with one column per series, of floats modified in place.
+        method (str): How to fill the missing data, one of "constant", "ffill", "linear" or "profile".
+        new_value (float): The value used when method is "constant".
+        limit (int): The longest gap (in consecutive readings) to fill. Longer gaps are left as NaN.
+        hours (numpy.ndarray): The hour of the day of each row, required when method is "profile".
+        positions (numpy.ndarray): The hour of each row on the station's timeline, used to interpolate when method
+            is "linear". Defaults to the row number.
+    Returns:
+        The values array.
+    """
+
+    columns = values.reshape(len(values), -1)  # A view, so filling a column fills values
+    for i in range(columns.shape[1]):
+        rows, filled = gap_fill_values(columns[:, i], method, new_value, limit, hours, positions)
+        columns[rows, i] = filled
+    return values
+
+
+def gap_fill_values(pollutant_values, method, new_value=None, limit=None, hours=None, positions=None):
+    """
+    Works out which missing values of a series to fill and what to fill them with.
+    Only the gaps are expanded to one entry per reading, so the memory used grows with the amount of missing data.
+    Parameters:
+        pollutant_values (numpy.ndarray): A 1D array of floats where NaN represents missing data.
+        method (str): How to fill the missing data, one of "constant", "ffill", "linear" or "profile".
+        new_value (float): The value used when method is "constant".
+        limit (int): The longest gap (in consecutive readings) to fill. Longer gaps are left as NaN.
+        hours (numpy.ndarray): The hour of the day of each reading, required when method is "profile".
+        positions (numpy.ndarray): The hour of each reading on the station's timeline, used when method is
+            "linear". Defaults to the row number.
+    Returns:
+        A tuple of the rows to fill and the value for each of them.
+    """
+
+    if method not in ("constant", "ffill", "linear", "profile"):
+        raise ValueError(f"Unknown fill method: {method}")
+    missing = np.isnan(pollutant_values)
+    if method == "constant" and limit is None:
+        return np.flatnonzero(missing), float(new_value)
+
+    starts, lengths = find_runs(missing)
+    keep = np.ones(len(starts), dtype=bool) if limit is None else lengths <= limit
+    before = starts - 1  # Last valid reading before each gap
+    after = starts + lengths  # First valid reading after each gap
+    if method == "ffill":
+        keep &= before >= 0  # Nothing to repeat before the first valid value
+    elif method == "linear":
+        keep &= (before >= 0) & (after < len(pollutant_values))  # Gaps at either end cannot be interpolated
+    starts, lengths, before, after = starts[keep], lengths[keep], before[keep], after[keep]
+    gaps = np.repeat(np.arange(len(starts)), lengths)  # The gap of each row to fill
+    rows = starts[gaps] + np.arange(len(gaps)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    if method == "constant":
+        return rows, float(new_value)
+    if method == "ffill":
+        return rows, pollutant_values[before][gaps]
+    if method == "linear":
+        positions = np.arange(len(pollutant_values)) if positions is None else positions
+        first = pollutant_values[before]
+        step = (pollutant_values[after] - first) / (positions[after] - positions[before])
+        return rows, first[gaps] + step[gaps] * (positions[rows] - positions[before][gaps])
+    return rows, group_statistics(pollutant_values, hours, HOURS_PER_DAY)["mean"][hours[rows]]  # Hourly profile
+
+
+def rolling_sums(values, window):
+    """
+    Calculates the sum and number of valid values in each trailing window in O(n) using cumulative sums.
+    Parameters:
+        values (numpy.ndarray): A 1D array, or a 2D array with one column per series, where NaN is missing data.
+        window (int): The number of values in each window, ending at the current value.
+    Returns:
+        A tuple of numpy arrays (sums, counts) with the same shape as values.
+    """
+
+    valid = ~np.isnan(values)
+    padding = ((1, 0),) + ((0, 0),) * (values.ndim - 1)  # Leading zero so each window is a difference of two sums
+    cumulative_totals = np.pad(np.where(valid, values, 0).cumsum(axis=0, dtype=np.float64), padding)
+    cumulative_counts = np.pad(valid.cumsum(axis=0), padding)
+    starts = np.maximum(np.arange(1, len(values) + 1) - window, 0)  # Windows at the start are truncated
+    return (cumulative_totals[1:] - cumulative_totals[starts],
+            cumulative_counts[1:] - cumulative_counts[starts])
+
+
+def rolling_window_max(values, window):
+    """
+    Calculates the maximum of each trailing window in O(n) with the van Herk/Gil-Werman algorithm, ignoring NaN.
+    Parameters:
+        values (numpy.ndarray): A 1D array, or a 2D array with one column per series, where NaN is missing data.
+        window (int): The number of values in each window, ending at the current value.
+    Returns:
+        A numpy array with the same shape as values, with NaN for windows without any valid values.
+    """
+
+    num_values = len(values)
+    num_blocks = -(-(num_values + window - 1) // window)
+    padding = ((window - 1, num_blocks * window - num_values - window + 1),) + ((0, 0),) * (values.ndim - 1)
+    padded = np.pad(np.where(np.isnan(values), -np.inf, values).astype(np.float64), padding,
+                    constant_values=-np.inf)  # Pad so window i covers padded[i:i + window] and blocks are full
+    blocks = padded.reshape((num_blocks, window) + values.shape[1:])
+    prefix = np.maximum.accumulate(blocks, axis=1).reshape(padded.shape)  # Max from the block start to each value
+    suffix = np.flip(np.maximum.accumulate(np.flip(blocks, axis=1), axis=1), axis=1).reshape(
+        padded.shape)  # Max from each value to the block end
+    maxima = np.maximum(suffix[:num_values], prefix[window - 1:window - 1 + num_values])
+    maxima[np.isneginf(maxima)] = np.nan
+    return maxima
+
+
+def apply_coverage(statistics, counts, window, min_coverage):
+    """
+    Replaces rolling statistics with NaN where too few valid values were in the window.
+    Parameters:
+        statistics (numpy.ndarray): The statistic for each window.
+        counts (numpy.ndarray): The number of valid values in each window.
+        window (int): The number of values in each window.
+        min_coverage (float): The fraction of the window that must hold valid values.
+    Returns:
+        The statistics array, modified in place.
+    """
+
+    statistics[counts < max(min_coverage * window, 1)] = np.nan  # At least one value is always required
+    return statistics
+
+
+def get_periods(station_data, granularity):
+    """
+    Gets the period that each reading belongs to for a monitoring station.
+    Parameters:
+        station_data (pandas.DataFrame): The data for a single monitoring station.
+        granularity (str): The length of each period, one of "day", "month", "year" or "all".
+    Returns:
+        A 1D numpy array of period names (YYYY-MM-DD prefixes, or "all").
+    """
+
+    if granularity == "all":
+        return np.full(len(station_data), "all")
+    unit = {"day": "D", "month": "M", "year": "Y"}[granularity]
+    return get_days(station_data).astype(f"datetime64[{unit}]").astype(str)
+
+
+def add_to_sketches(sketches, values, periods, relative_accuracy=0.01):
+    """
+    Adds values to the sketch of the period they belong to, creating sketches for new periods.
+    Parameters:
+        sketches (dict): Dictionary mapping each period to a QuantileSketch, updated in place.
+        values (numpy.ndarray): The values to add.
+        periods (numpy.ndarray): The period of each value.
+        relative_accuracy (float): The relative accuracy of newly created sketches.
+    """
+
+    names, groups = np.unique(periods, return_inverse=True)
+    order = np.argsort(groups, kind="stable")  # Group the values of each period together
+    bounds = np.searchsorted(groups[order], np.arange(len(names) + 1))
+    for i, period in enumerate(names.tolist()):
+        if period not in sketches:
+            sketches[period] = QuantileSketch(relative_accuracy)
+        sketches[period].add(values[order[bounds[i]:bounds[i + 1]]])
+
+
+def exceedance_summary(exceeded, labels):
+    """
+    Summarises when a limit was exceeded.
+    Parameters:
+        exceeded (numpy.ndarray): A boolean array which is True for each hour or day over the limit.
+        labels (pandas.Index): The name of each hour or day.
+    Returns:
+        A dictionary with the "count" of exceedances, the "first" and "last" exceedance (None if there were none)
+        and the "episodes" as a list of (first, last, length) for each run of consecutive exceedances.
+    """
+
+    starts, lengths = find_runs(exceeded)
+    ends = starts + lengths - 1
+    return {"count": int(lengths.sum()),
+            "first": labels[starts[0]] if len(starts) else None,
+            "last": labels[ends[-1]] if len(starts) else None,
+            "episodes": list(zip(labels[starts], labels[ends], lengths.tolist()))}
+
+
+def to_report_list(values, sentinel):
+    """
+    Converts an array of results into a list of floats, replacing NaN with a message.
+    Parameters:
+        values (numpy.ndarray): The results to convert.
+        sentinel (str): The message used where there was no data.
+    Returns:
+        A list of floats and sentinel strings.
+    """
+
+    return [sentinel if value != value else value for value in values.tolist()]  # NaN is the only value != itself
+
+
+class StreamingReport:
+    """
+    Online accumulators for the reports of a single pollutant, updated one chunk of readings at a time.
+    The running sum, count, minimum and maximum are kept per day, hour of the day and month, along with the running
+    peak hour of each day, so memory grows with the number of days covered rather than the number of readings.
+    """
+
+    LEVELS = ("day", "hour", "month")
+    STATISTICS = ("totals", "counts", "rows", "minimums", "maximums")
+
+    def __init__(self, pollutant):
+        """
+        Parameters:
+            pollutant (str): The name of the pollutant to accumulate.
+        """
+
+        self.pollutant = pollutant
+        self.first_day = None  # Days are stored relative to the earliest day seen
+        for level, size in zip(self.LEVELS, (0, HOURS_PER_DAY, 12)):
+            setattr(self, f"{level}_totals", np.zeros(size))
+            setattr(self, f"{level}_counts", np.zeros(size, dtype=np.int64))  # Valid readings
+            setattr(self, f"{level}_rows", np.zeros(size, dtype=np.int64))  # All readings, including missing ones
+            setattr(self, f"{level}_minimums", np.full(size, np.inf))
+            setattr(self, f"{level}_maximums", np.full(size, -np.inf))
+        self.peak_values = np.zeros(0)
+        self.peak_hours = np.zeros(0, dtype=np.int64)
+
+    def update(self, chunk):
+        """
+        Adds a chunk of readings to the accumulators.
+        Parameters:
+            chunk (pandas.DataFrame): A chunk of the data for a single monitoring station.
+        """
+
+        if len(chunk) == 0:
+            return
+        pollutant_values = get_pollutant_values(chunk, self.pollutant)
+        starts = get_timestamps(chunk) - pd.Timedelta(hours=1)  # Readings are labelled by the end of the hour
+        days = starts.to_numpy().astype("datetime64[D]").astype(np.int64)
+        hours = starts.hour.to_numpy()
+        valid = ~np.isnan(pollutant_values)
+
+        self.reserve(days.min(), days.max())
+        offsets = days - days.min()  # Day of each reading within this chunk
+        start = days.min() - self.first_day
+        stop = start + offsets.max() + 1
+        for level, keys, bounds in (("day", offsets, slice(start, stop)), ("hour", hours, slice(None)),
+                                    ("month", starts.month.to_numpy() - 1, slice(None))):
+            self.accumulate(level, bounds, keys, pollutant_values, valid)
+
+        chunk_peaks = np.full(stop - start, -np.inf)
+        np.maximum.at(chunk_peaks, offsets[valid], pollutant_values[valid])
+        is_peak = np.flatnonzero(valid & (pollutant_values == chunk_peaks[offsets]))
+        peak_days, first = np.unique(offsets[is_peak], return_index=True)  # Keep the first hour of equal peaks
+        higher = chunk_peaks[peak_days] > self.peak_values[start + peak_days]  # Earlier chunks win ties
+        self.peak_values[start + peak_days[higher]] = chunk_peaks[peak_days[higher]]
+        self.peak_hours[start + peak_days[higher]] = hours[is_peak[first[higher]]]
+
+    def accumulate(self, level, bounds, keys, pollutant_values, valid):
+        """
+        Adds readings to the accumulators of one level in a single vectorised pass.
+        Parameters:
+            level (str): The level to update, one of "day", "hour" or "month".
+            bounds (slice): The part of the level's accumulators that the keys index into.
+            keys (numpy.ndarray): The position of each reading within bounds.
+            pollutant_values (numpy.ndarray): The value of each reading.
+            valid (numpy.ndarray): Whether each reading holds a value.
+        """
+
+        size = len(getattr(self, f"{level}_totals")[bounds])
+        getattr(self, f"{level}_totals")[bounds] += np.bincount(keys[valid], weights=pollutant_values[valid],
+                                                                minlength=size)
+        getattr(self, f"{level}_counts")[bounds] += np.bincount(keys[valid], minlength=size)
+        getattr(self, f"{level}_rows")[bounds] += np.bincount(keys, minlength=size)
+        np.minimum.at(getattr(self, f"{level}_minimums")[bounds], keys[valid], pollutant_values[valid])
+        np.maximum.at(getattr(self, f"{level}_maximums")[bounds], keys[valid], pollutant_values[valid])
+
+    def reserve(self, first_day, last_day):
+        """
+        Grows the daily accumulators so that they cover a range of days.
+        Parameters:
+            first_day (int): The first day to cover, as days since the epoch.
+            last_day (int): The last day to cover, as days since the epoch.
+        """
+
+        if self.first_day is None:
+            self.first_day = first_day
+        before = max(self.first_day - first_day, 0)
+        after = max(last_day - (self.first_day + len(self.day_totals) - 1), 0)
+        if before or after:
+            for statistic, fill in zip(self.STATISTICS, (0, 0, 0, np.inf, -np.inf)):
+                name = f"day_{statistic}"
+                setattr(self, name, np.pad(getattr(self, name), (before, after), constant_values=fill))
+            self.peak_values = np.pad(self.peak_values, (before, after))  # A peak must be above 0 to be reported
+            self.peak_hours = np.pad(self.peak_hours, (before, after), constant_values=-1)
+            self.first_day -= before
+
+    def statistics(self, level):
+        """
+        Gets the pre-aggregated statistics of one level.
+        Parameters:
+            level (str): The level to get, one of "day", "hour" or "month".
+        Returns:
+            A dictionary of numpy arrays for the sum, count, min, max and missing count of each day, hour or month,
+            where min and max are NaN if there were no valid readings.
+        """
+
+        counts = getattr(self, f"{level}_counts")
+        no_data = counts == 0
+        return {"sum": getattr(self, f"{level}_totals"), "count": counts,
+                "min": np.where(no_data, np.nan, getattr(self, f"{level}_minimums")),
+                "max": np.where(no_data, np.nan, getattr(self, f"{level}_maximums")),
+                "missing": getattr(self, f"{level}_rows") - counts}
+
+    def count_missing_data(self):
+        """
+        Counts the number of missing readings.
+        Returns:
+            An integer representing the number of missing data values.
+        """
+
+        return int((self.day_rows - self.day_counts).sum())
+
+    def days(self):
+        """
+        Gets the days covered by the accumulators.
+        Returns:
+            A list of dates (YYYY-MM-DD) in the same order as daily_average.
+        """
+
+        if self.first_day is None:
+            return []
+        first = np.datetime64(int(self.first_day), "D")
+        return np.arange(first, first + len(self.day_totals)).astype(str).tolist()
+
+    def daily_average(self):
+        """
+        Calculates the average value each day.
+        Returns:
+            A list of values for each day, with a message for days without any data.
+        """
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return to_report_list(self.day_totals / self.day_counts, "No data for this day")
+
+    def hourly_average(self):
+        """
+        Calculates the average value for each hour of the day.
+        Returns:
+            A list of 24 values, with a message for hours without any data.
+        """
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return to_report_list(self.hour_totals / self.hour_counts, "No data for this hour")
+
+    def monthly_average(self):
+        """
+        Calculates the average value for each month of the year that has been seen.
+        Returns:
+            A list of values for each month, with a message for months without any data.
+        """
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return to_report_list((self.month_totals / self.month_counts)[self.month_rows > 0],
+                                  "No data for this month")
+
+    def peak_hour_date(self, date):
+        """
+        Finds the hour and value for which the pollutant was highest on a particular date.
+        Parameters:
+            date (str): The date on which to find the peak value (YYYY-MM-DD).
+        Returns:
+            A tuple of the hour and the peak value, or ("", 0) if there was no positive value.
+        """
+
+        if self.first_day is None:
+            return "", 0
+        day = np.datetime64(date, "D").astype(np.int64) - self.first_day
+        if not 0 <= day < len(self.peak_hours) or self.peak_hours[day] < 0:
+            return "", 0
+        return f"{self.peak_hours[day] + 1}:00", float(self.peak_values[day])
+
+
+class AnomalyDetector:
+    """
+    Online detector of anomalous readings for a single pollutant using exponentially weighted z-scores.
+    Only the running mean, variance and number of readings are kept, so each new reading costs O(1).
+    Readings can be added one at a time as they arrive or a chunk at a time, with the same results.
+    """
+
+    def __init__(self, pollutant, alpha=ANOMALY_ALPHA, threshold=ANOMALY_THRESHOLD, warmup=HOURS_PER_DAY):
+        """
+        Parameters:
+            pollutant (str): The name of the pollutant to check.
+            alpha (float): The weight of each new reading in the running average and variance.
+            threshold (float): The z-score above which a reading is flagged.
+            warmup (int): The number of valid readings seen before any reading is flagged.
+        """
+
+        self.pollutant = pollutant
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.mean = np.nan
+        self.variance = 0.0
+        self.count = 0  # Valid readings seen
+        self.anomalies = []  # (timestamp, value, score) of each flagged reading
+
+    def add(self, timestamp, value):
+        """
+        Adds a single reading.
+        Parameters:
+            timestamp (pandas.Timestamp): The timestamp of the reading.
+            value (float): The reading, or NaN if it is missing.
+        Returns:
+            The z-score of the reading, or NaN if it is missing or the detector is still warming up.
+        """
+
+        if value != value:  # Missing readings do not change the running statistics
+            return np.nan
+        if self.count == 0:
+            self.mean = value
+        deviation = value - self.mean
+        score = deviation / math.sqrt(self.variance) if self.variance > 0 and self.count >= self.warmup else np.nan
+        increment = self.alpha * deviation
+        self.mean += increment
+        self.variance = (1 - self.alpha) * (self.variance + deviation * increment)
+        self.count += 1
+        if abs(score) > self.threshold:
+            self.anomalies.append((str(timestamp), float(value), float(score)))
+        return score
+
+    def update(self, chunk):
+        """
+        Adds a chunk of readings.
+        Parameters:
+            chunk (pandas.DataFrame): A chunk of the data for a single monitoring station.
+        Returns:
+            A numpy array of the z-score of each reading, NaN where it is missing or the detector is warming up.
+        """
+
+        pollutant_values = get_pollutant_values(chunk, self.pollutant)
+        valid = np.flatnonzero(~np.isnan(pollutant_values))
+        scores = np.full(len(pollutant_values), np.nan)
+        valid_scores, self.mean, self.variance = ewma_scores(pollutant_values[valid], self.alpha, self.mean,
+                                                             self.variance)
+        valid_scores[self.count + np.arange(len(valid)) < self.warmup] = np.nan
+        scores[valid] = valid_scores
+        self.count += len(valid)
+
+        with np.errstate(invalid="ignore"):
+            flagged = np.flatnonzero(np.abs(scores) > self.threshold)
+        self.anomalies.extend(zip(get_timestamps(chunk)[flagged].astype(str), pollutant_values[flagged].tolist(),
+                                  scores[flagged].tolist()))
+        return scores
+
+    def anomaly_table(self):
+        """
+        Gets the flagged readings.
+        Returns:
+            A DataFrame indexed by the timestamp of each flagged reading with its "value" and "score".
+        """
+
+        timestamps, values, scores = zip(*self.anomalies) if self.anomalies else ((), (), ())
+        return pd.DataFrame({"value": values, "score": scores},
+                            index=pd.DatetimeIndex(pd.to_datetime(list(timestamps)), name="timestamp"))
+
+
+class DateIndex:
+    """
+    Maps each day to the block of rows holding its readings, so that finding a day or a range of days
+    takes constant time instead of scanning the date column.
+    """
+
+    def __init__(self, station_data):
+        """
+        Parameters:
+            station_data (pandas.DataFrame): The data for a single monitoring station.
+        """
+
+        self.source = station_data.index  # Used to detect when the rows of the DataFrame change
+        days = get_days(station_data).astype(np.int64)
+        self.order = None
+        if len(days) > 1 and (np.diff(days) < 0).any():  # Rows out of date order cannot be sliced directly
+            self.order = np.argsort(days, kind="stable")
+            days = days[self.order]
+        self.first_day = int(days[0]) if len(days) else 0
+        counts = np.bincount(days - self.first_day) if len(days) else np.zeros(0, dtype=np.int64)
+        self.starts = np.concatenate([[0], np.cumsum(counts)])  # Rows of day d are starts[d]:starts[d + 1]
+
+    def __deepcopy__(self, memo):
+        """
+        Shares the index when pandas copies the attrs of a DataFrame, as it is never modified once built.
+        """
+
+        return self
+
+    def day_number(self, date):
+        """
+        Converts a date into its position in the index.
+        Parameters:
+            date (str): The date (YYYY-MM-DD).
+        Returns:
+            An integer, which may be outside the range of days covered.
+        """
+
+        try:
+            return int(np.datetime64(date, "D").astype(np.int64)) - self.first_day
+        except ValueError:  # Not a valid date so no rows can match
+            return -1
+
+    def range(self, start_date, end_date):
+        """
+        Finds the rows for all days between two dates (inclusive).
+        Parameters:
+            start_date (str): The first date (YYYY-MM-DD).
+            end_date (str): The last date (YYYY-MM-DD).
+        Returns:
+            A slice of rows, or an array of rows if the data is not in date order.
+        """
+
+        num_days = len(self.starts) - 1
+        first = min(max(self.day_number(start_date), 0), num_days)
+        last = min(max(self.day_number(end_date) + 1, first), num_days)
+        rows = slice(int(self.starts[first]), int(self.starts[last]))
+        return rows if self.order is None else self.order[rows]
+
+    def rows(self, date):
+        """
+        Finds the rows for a single day.
+        Parameters:
+            date (str): The date (YYYY-MM-DD).
+        Returns:
+            A slice of rows, or an array of rows if the data is not in date order.
+        """
+
+        return self.range(date, date)
+
+
+class QuantileSketch:
+    """
+    A mergeable quantile sketch with relative error guarantees (in the style of DDSketch).
+    Values are counted in logarithmically sized buckets, so any quantile is estimated to within the relative accuracy
+    while memory only grows with the logarithm of the range of values. Sketches of different chunks, periods or
+    processes can be merged without losing accuracy.
+    """
+
+    MIN_VALUE = 1e-9  # Values closer to 0 than this are counted as 0
+
+    def __init__(self, relative_accuracy=0.01):
+        """
+        Parameters:
+            relative_accuracy (float): The maximum relative error of each quantile, between 0 and 1.
+        """
+
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)  # Ratio between bucket boundaries
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}  # Bucket key to count for positive values
+        self.negative = {}  # Bucket key to count for the magnitude of negative values
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, values):
+        """
+        Adds values to the sketch, ignoring NaN.
+        Parameters:
+            values (numpy.ndarray): The values to add.
+        """
+
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.zero_count += int((np.abs(values) < self.MIN_VALUE).sum())
+        for store, magnitudes in ((self.positive, values[values >= self.MIN_VALUE]),
+                                  (self.negative, -values[values <= -self.MIN_VALUE])):
+            keys, counts = np.unique(np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64),
+                                     return_counts=True)
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                store[key] = store.get(key, 0) + count
+
+    def merge(self, other):
+        """
+        Adds all the values counted by another sketch to this sketch.
+        Parameters:
+            other (QuantileSketch): A sketch with the same relative accuracy.
+        """
+
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative accuracy can be merged")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        """
+        Estimates a quantile of the values added to the sketch.
+        Parameters:
+            q (float): The quantile to estimate, between 0 and 1 (e.g. 0.5 for the median).
+        Returns:
+            The estimated value, or NaN if the sketch is empty.
+        """
+
+        if self.count == 0:
+            return math.nan
+        negative_keys = sorted(self.negative, reverse=True)  # Most negative values first
+        positive_keys = sorted(self.positive)
+        counts = np.array([self.negative[k] for k in negative_keys] + [self.zero_count] +
+                          [self.positive[k] for k in positive_keys])
+        bucket = int(np.searchsorted(np.cumsum(counts), q * (self.count - 1), side="right"))
+        if bucket < len(negative_keys):
+            return -self.bucket_value(negative_keys[bucket])
+        if bucket == len(negative_keys):
+            return 0.0
+        return self.bucket_value(positive_keys[bucket - len(negative_keys) - 1])
+
+    def bucket_value(self, key):
+        """
+        Gets the value representing a bucket, which is within the relative accuracy of every value in it.
+        Parameters:
+            key (int): The key of the bucket.
+        Returns:
+            The representative value of the bucket.
+        """
+
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+
+class RollupCube:
+    """
+    A persisted store of pre-aggregated statistics (sum, count, min, max and missing count per day, hour of the day
+    and month) for every monitoring station and pollutant. It is built once from the csv files, saved to disk and
+    updated with only the new readings. It can be passed in place of the loaded data to daily_average, hourly_average,
+    monthly_average, peak_hour_date and count_missing_data. The other reporting functions need the readings themselves
+    and raise a TypeError if given a RollupCube.
+    """
+
+    def __init__(self, reports=None):
+        """
+        Parameters:
+            reports (dict): Dictionary mapping each station to a dictionary of StreamingReport for each pollutant.
+        """
+
+        self.reports = {} if reports is None else reports
+
+    def append(self, monitoring_station, rows):
+        """
+        Adds new readings for a monitoring station.
+        Parameters:
+            monitoring_station (str): The name of the monitoring station.
+            rows (pandas.DataFrame): The new readings, in the same format as load_station.
+        """
+
+        station_reports = self.reports.setdefault(monitoring_station, {})
+        for pollutant in get_pollutants(rows):
+            station_reports.setdefault(pollutant, StreamingReport(pollutant)).update(rows)
+
+    def update_from_csv(self, monitoring_station, filename, chunk_size=CHUNK_SIZE):
+        """
+        Adds the readings that have been appended to a station csv file since the cube was last updated.
+        Parameters:
+            monitoring_station (str): The name of the monitoring station.
+            filename (str): The path of the csv file.
+            chunk_size (int): The number of rows read from the file at a time.
+        """
+
+        for chunk in read_station_chunks(filename, chunk_size, skip_rows=self.num_rows(monitoring_station)):
+            self.append(monitoring_station, chunk)
+
+    def num_rows(self, monitoring_station):
+        """
+        Counts the readings that have been added for a monitoring station.
+        Parameters:
+            monitoring_station (str): The name of the monitoring station.
+        Returns:
+            The number of readings, including missing ones.
+        """
+
+        for report in self.reports.get(monitoring_station, {}).values():
+            return int(report.day_rows.sum())
+        return 0
+
+    def save(self, filename):
+        """
+        Saves the cube to a numpy .npz file.
+        Parameters:
+            filename (str): The path of the file to write.
+        """
+
+        arrays = {}
+        for monitoring_station, station_reports in self.reports.items():
+            for pollutant, report in station_reports.items():
+                prefix = f"{monitoring_station}|{pollutant}|"
+                arrays[prefix + "first_day"] = np.array([] if report.first_day is None else [report.first_day],
+                                                        dtype=np.int64)
+                for name, value in vars(report).items():
+                    if isinstance(value, np.ndarray):
+                        arrays[prefix + name] = value
+        np.savez(filename, **arrays)
+
+    @staticmethod
+    def load(filename):
+        """
+        Loads a cube saved by RollupCube.save.
+        Parameters:
+            filename (str): The path of the .npz file.
+        Returns:
+            The RollupCube.
+        """
+
+        reports = {}
+        with np.load(filename) as arrays:
+            for key in arrays.files:
+                monitoring_station, pollutant, name = key.split("|")
+                report = reports.setdefault(monitoring_station, {}).setdefault(pollutant, StreamingReport(pollutant))
+                if name == "first_day":
+                    report.first_day = int(arrays[key][0]) if len(arrays[key]) else None
+                else:
+                    setattr(report, name, arrays[key])
+        return RollupCube(reports)
+
+
+class StationRegistry(Mapping):
+    """
+    A dictionary of station DataFrames that parses each station's csv file the first time it is used,
+    so that queries only pay for the stations they touch.
+    """
+
+    def __init__(self, directory=DATA_DIRECTORY, dtype=np.float64, store_directory=None):
+        """
+        Parameters:
+            directory (str): The directory containing the Pollution-*.csv files.
+            dtype (numpy.dtype): The floating point type used to store the pollutant values.
+            store_directory (str): If given, stations are memory-mapped from this binary store.
+        """
+
+        self.files = discover_stations(directory)
+        self.dtype = dtype
+        self.store_directory = store_directory
+        self.stations = {}  # Stations that have been loaded
+        self.locks = {station: threading.Lock() for station in self.files}  # Stops two threads parsing one file
+
+    def __getitem__(self, monitoring_station):
+        """
+        Gets the DataFrame for a station, loading it if needed.
+        Parameters:
+            monitoring_station (str): The name of the monitoring station.
+        Returns:
+            The station's DataFrame.
+        """
+
+        if monitoring_station not in self.stations:
+            with self.locks[monitoring_station]:  # Raises KeyError for unknown stations
+                if monitoring_station not in self.stations:
+                    self.stations[monitoring_station] = self.load(self.files[monitoring_station])
+        return self.stations[monitoring_station]
+
+    def __iter__(self):
+        """
+        Iterates over the station names without loading any stations.
+        """
+
+        return iter(self.files)
+
+    def __len__(self):
+        """
+        Returns:
+            The number of stations found.
+        """
+
+        return len(self.files)
+
+    def load(self, filename):
+        """
+        Loads a station from its csv file, or from the binary store if the registry uses one.
+        Parameters:
+            filename (str): The path of the csv file.
+        Returns:
+            The station's DataFrame.
+        """
+
+        if self.store_directory is None:
+            return load_station(filename, self.dtype)
+        return load_binary_station(filename, self.store_directory, self.dtype)
+
+    def is_loaded(self, monitoring_station):
+        """
+        Checks whether a station has been loaded.
+        Parameters:
+            monitoring_station (str): The name of the monitoring station.
+        Returns:
+            True if the station's csv file has been parsed.
+        """
+
+        return monitoring_station in self.stations
 
-    m_data = pd.read_csv("data/Pollution-London Marylebone Road.csv")
-    h_data = pd.read_csv("data/Pollution-London Harlington.csv")
-    k_data = pd.read_csv("data/Pollution-London N Kensington.csv")
+    def load_all(self, workers=None):
+        """
+        Loads every station that has not been loaded yet, sharing the files between a pool of threads.
+        Parameters:
+            workers (int): The number of threads. Defaults to the ThreadPoolExecutor default.
+        """
 
-    return {"Marylebone Road": m_data, "Harlington": h_data, "N Kensington": k_data}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(self.__getitem__, [s for s in self.files if s not in self.stations]))
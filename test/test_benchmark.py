@@ -0,0 +1,43 @@
+import numpy as np
+import benchmark
+import reporting
+
+
+def test_generate_station(tmp_path):
+    """
+    Tests that the synthetic station files can be loaded and are the same for the same seed.
+    """
+
+    filename = tmp_path / "Pollution-Station 1.csv"
+    assert benchmark.generate_station(filename, years=2, missing_rate=0.1, seed=3) == 17520
+    station_data = reporting.load_station(str(filename))
+    assert len(station_data) == 17520
+    assert list(station_data["time"].iloc[[0, 23]]) == ["01:00:00", "24:00:00"]
+    assert 0.08 < np.isnan(station_data["pm10"].to_numpy()).mean() < 0.12
+    first = filename.read_text()
+    benchmark.generate_station(filename, years=2, missing_rate=0.1, seed=3)
+    assert filename.read_text() == first
+
+
+def test_generate_dataset(tmp_path):
+    """
+    Tests that every generated station is discovered by the reporting module.
+    """
+
+    benchmark.generate_dataset(tmp_path, years=1, stations=4)
+    data = reporting.load_data(directory=str(tmp_path))
+    assert list(data.keys()) == ["Station 1", "Station 2", "Station 3", "Station 4"]
+    assert len(reporting.daily_average(data, "Station 4", "no")) == 365
+
+
+def test_compare_results():
+    """
+    Tests that only benchmarks slower than the tolerance are reported as regressions.
+    """
+
+    baseline = [{"name": "daily_average", "years": 1, "stations": 3, "best": 1.0},
+                {"name": "hourly_average", "years": 1, "stations": 3, "best": 1.0}]
+    results = [{"name": "daily_average", "years": 1, "stations": 3, "best": 1.1},
+               {"name": "hourly_average", "years": 1, "stations": 3, "best": 1.5},
+               {"name": "monthly_average", "years": 1, "stations": 3, "best": 9.0}]
+    assert benchmark.compare_results(baseline, results, 0.25) == [("hourly_average", 1, 3, 1.0, 1.5)]
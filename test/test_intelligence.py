@@ -1,4 +1,5 @@
 import os.path
+import numpy as np
 import intelligence
 
 
@@ -20,6 +21,41 @@ def test_find_cyan_pixels():
     assert os.path.exists("map-cyan-pixels.jpg")
 
 
+def test_colour_mask():
+    """
+    Tests that colour rules are applied to RGB, RGBA and grayscale images.
+    """
+
+    rgba = np.array([[[200, 10, 10, 255], [200, 10, 10, 0], [10, 200, 200, 255]]], dtype=np.uint8)
+    red = intelligence.red_rule(upper_threshold=100, lower_threshold=50)
+    assert intelligence.colour_mask(rgba, red).tolist() == [[True, True, False]]
+    assert intelligence.colour_mask(rgba[..., :3], intelligence.cyan_rule(100, 50)).tolist() == [[False, False, True]]
+    opaque_red = dict(red, alpha=(128, None))
+    assert intelligence.colour_mask(rgba, opaque_red).tolist() == [[True, False, False]]
+    assert intelligence.colour_mask(rgba[..., :3], opaque_red).tolist() == [[True, True, False]]
+    grey = np.array([[0, 100, 255]], dtype=np.uint8)
+    assert intelligence.colour_mask(grey, intelligence.colour_rule(red=(50, 200))).tolist() == [[False, True, False]]
+
+
+def test_segment_colours():
+    """
+    Tests that a single pass labels each pixel with the first matching class and agrees with colour_mask.
+    """
+
+    rgba = np.array([[[200, 10, 10, 255], [10, 200, 200, 255], [10, 10, 10, 255], [120, 120, 120, 255]]],
+                    dtype=np.uint8)
+    classes = {"red": intelligence.red_rule(100, 50), "cyan": intelligence.cyan_rule(100, 50),
+               "dark": intelligence.colour_rule(red=(None, 60), green=(None, 60)),
+               "any": intelligence.colour_rule()}
+    labels = intelligence.segment_colours(rgba, classes)
+    assert labels.dtype == np.uint8
+    assert labels.tolist() == [[1, 2, 3, 4]]
+    assert intelligence.segment_colours(rgba.astype(float), classes).tolist() == labels.tolist()
+    masks = intelligence.class_masks(labels, classes)
+    assert masks["cyan"].tolist() == intelligence.colour_mask(rgba, classes["cyan"]).tolist()
+    assert masks["any"].tolist() == [[False, False, False, True]]
+
+
 def test_detect_connected_components():
     """
     Tests that the returned 2D array has the same dimensions as the image passed in.
@@ -30,6 +66,67 @@ def test_detect_connected_components():
     assert mark.shape == (1140, 1053)
 
 
+def test_label_components():
+    """
+    Tests that components are labelled in raster order with 8 and 4 connectivity, with their pixel counts.
+    """
+
+    img = np.array([[1, 1, 0, 0, 1],
+                    [0, 0, 1, 0, 1],
+                    [1, 0, 0, 0, 0],
+                    [1, 1, 0, 1, 1]])
+    labels, counts = intelligence.label_components(img)
+    assert labels.dtype == np.int32
+    assert labels.tolist() == [[1, 1, 0, 0, 2],
+                               [0, 0, 1, 0, 2],
+                               [3, 0, 0, 0, 0],
+                               [3, 3, 0, 4, 4]]
+    assert counts.tolist() == [10, 3, 2, 3, 2]
+    labels, counts = intelligence.label_components(img, connectivity=4)
+    assert labels[1, 2] == 3 and labels.max() == 5
+    assert counts[1:].tolist() == [2, 2, 1, 3, 2]
+
+
+def test_label_components_tiled():
+    """
+    Tests that labelling in strips and merging the seams gives the same labels as labelling the whole matrix.
+    """
+
+    rng = np.random.default_rng(0)
+    img = rng.random((60, 45)) < 0.45
+    img[::6, :] = True  # Components spanning many strips
+    for connectivity in (4, 8):
+        labels, counts = intelligence.label_components(img, connectivity)
+        for strip_rows in (1, 4, 13):
+            tiled_labels, tiled_counts = intelligence.label_components_tiled(img, connectivity, strip_rows=strip_rows)
+            assert (tiled_labels == labels).all()
+            assert tiled_counts.tolist() == counts.tolist()
+    tiled_labels, _ = intelligence.label_components_tiled(img, workers=2)
+    assert (tiled_labels == intelligence.label_components(img)[0]).all()
+
+
+def test_stream_colour_mask(tmp_path):
+    """
+    Tests that masking and labelling a memory-mapped image in strips matches processing it whole.
+    """
+
+    rng = np.random.default_rng(1)
+    img = rng.integers(0, 256, (70, 40, 4), dtype=np.uint8)
+    np.save(tmp_path / "map.npy", img)
+    rule = intelligence.red_rule(upper_threshold=100, lower_threshold=128)
+    labeler = intelligence.StripLabeler(tmp_path / "labels.npy", img.shape[:2])
+    mask = intelligence.stream_colour_mask(str(tmp_path / "map.npy"), rule, tmp_path / "mask.npy", strip_rows=9,
+                                           labeler=labeler)
+    labels, counts = labeler.finish()
+    expected_mask = intelligence.colour_mask(img, rule)
+    expected_labels, expected_counts = intelligence.label_components(expected_mask)
+    assert (np.load(tmp_path / "mask.npy") == expected_mask).all()
+    assert (np.load(tmp_path / "labels.npy") == expected_labels).all()
+    assert counts.tolist() == expected_counts.tolist()
+    labels, counts = intelligence.stream_connected_components(mask, tmp_path / "labels4.npy", 4, strip_rows=5)
+    assert (labels == intelligence.label_components(expected_mask, 4)[0]).all()
+
+
 def test_get_neighbours():
     """
     Tests that the correct neighbours are calculated.
@@ -0,0 +1,65 @@
+import csv
+import json
+import subprocess
+import sys
+import main
+
+
+def test_reporting_command_csv(tmp_path):
+    """
+    Tests that the daily average command writes one csv row per day without colour codes.
+    """
+
+    output = tmp_path / "daily.csv"
+    main.main(["reporting", "daily-average", "--station", "Harlington", "--pollutant", "no", "--output", str(output)])
+    with open(output) as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ["station", "pollutant", "date", "value"]
+    assert len(rows) == 366
+    assert rows[1][:3] == ["Harlington", "no", "2021-01-01"]
+    assert "\033[" not in output.read_text()
+
+
+def test_reporting_command_json(capsys):
+    """
+    Tests that results are written to stdout as JSON for every station by default.
+    """
+
+    main.main(["reporting", "missing-data", "--pollutant", "no", "--format", "json"])
+    results = json.loads(capsys.readouterr().out)
+    assert {"station": "Harlington", "pollutant": "no", "missing": 70} in results
+    assert len(results) == 3
+
+
+def test_fill_missing_command_json(capsys):
+    """
+    Tests that gaps left unfilled by --limit are written as JSON null rather than NaN.
+    """
+
+    main.main(["reporting", "fill-missing", "--station", "Marylebone Road", "--method", "linear", "--limit", "1",
+               "--format", "json"])
+    output = capsys.readouterr().out
+    assert output.count("NaN") == 0
+    results = json.loads(output)
+    assert len(results) == 8760
+    assert any(result["no"] is None for result in results)
+    assert all(result["pm10"] is None or isinstance(result["pm10"], float) for result in results)
+
+
+def test_lazy_imports():
+    """
+    Tests that starting the program does not import the heavy dependencies of the modules.
+    """
+
+    code = "import sys, main; print(any(name in sys.modules for name in ['skimage', 'pandas', 'matplotlib']))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+
+def test_menu_stations():
+    """
+    Tests that the original stations keep their menu numbers and new stations are listed after them.
+    """
+
+    data = dict.fromkeys(["Bloomsbury", "Harlington", "Marylebone Road", "N Kensington"])
+    assert main.menu_stations(data) == ["Marylebone Road", "Harlington", "N Kensington", "Bloomsbury"]
@@ -1,3 +1,6 @@
+import numpy as np
+import pandas as pd
+import pytest
 import reporting
 
 
@@ -89,3 +92,603 @@ def test_fill_missing_data():
     data = reporting.load_data()
     filled_data = reporting.fill_missing_data(data, 0, "Harlington", "no")
     assert reporting.count_missing_data(filled_data, "Harlington", "no") == 0
+
+
+def test_load_station():
+    """
+    Tests that pollutant columns are loaded as floats with NaN for missing data and indexed by timestamp.
+    """
+
+    station_data = reporting.load_station("data/Pollution-London Harlington.csv")
+    assert station_data["no"].dtype == "float64"
+    assert station_data["no"].isna().sum() == 70
+    assert str(station_data.index[0]) == "2021-01-01 01:00:00"
+    assert str(station_data.index[-1]) == "2022-01-01 00:00:00"
+
+
+def test_get_pollutant_values():
+    """
+    Tests that "No data" strings are converted into NaN when the raw csv is used.
+    """
+
+    station_data = pd.read_csv("data/Pollution-London Harlington.csv")
+    values = reporting.get_pollutant_values(station_data, "no")
+    assert values.dtype == np.float64
+    assert np.isnan(values).sum() == 70
+
+
+def test_day_matrix():
+    """
+    Tests that an hourly series is reshaped into days and a partial final day is padded with NaN.
+    """
+
+    matrix = reporting.day_matrix(np.arange(30, dtype=float))
+    assert matrix.shape == (2, 24)
+    assert matrix[1][5] == 29
+    assert np.isnan(matrix[1][6:]).all()
+
+
+def test_daily_average_no_data():
+    """
+    Tests that days without any data are reported with the sentinel message.
+    """
+
+    data = reporting.load_data()
+    data["Harlington"]["no"] = np.nan
+    result = reporting.daily_average(data, "Harlington", "no")
+    assert result[0] == "No data for this day"
+    assert len(result) == 365
+
+
+def test_report_cube():
+    """
+    Tests that the report cube matches the individual reporting functions for every station and pollutant.
+    """
+
+    data = reporting.load_data()
+    cube = reporting.report_cube(data)
+    for station in data.keys():
+        for pollutant in ["no", "pm10", "pm25"]:
+            report = cube[station][pollutant]
+            assert report["daily_average"] == reporting.daily_average(data, station, pollutant)
+            assert report["daily_median"] == reporting.daily_median(data, station, pollutant)
+            assert report["monthly_average"] == reporting.monthly_average(data, station, pollutant)
+            assert report["missing_data"] == reporting.count_missing_data(data, station, pollutant)
+    assert cube["Harlington"]["no"]["daily_peak"][0] == reporting.peak_hour_date(data, "2021-01-01", "Harlington", "no")
+
+
+def test_report_cube_workers():
+    """
+    Tests that sharing the stations between processes gives the same report cube.
+    """
+
+    data = reporting.load_data()
+    assert reporting.report_cube(data, ["pm10"], workers=2) == reporting.report_cube(data, ["pm10"])
+
+
+def test_read_station_chunks():
+    """
+    Tests that a station csv is read in chunks of the requested size.
+    """
+
+    chunks = list(reporting.read_station_chunks("data/Pollution-London Harlington.csv", chunk_size=1000))
+    assert len(chunks) == 9
+    assert sum(len(chunk) for chunk in chunks) == 8760
+
+
+def test_stream_report():
+    """
+    Tests that streaming a station csv in chunks gives the same reports as loading it into memory.
+    """
+
+    data = reporting.load_data()
+    reports = reporting.stream_report("data/Pollution-London Harlington.csv", chunk_size=1000)
+    assert np.allclose(reports["no"].daily_average(), reporting.daily_average(data, "Harlington", "no"))
+    assert np.allclose(reports["pm10"].hourly_average(), reporting.hourly_average(data, "Harlington", "pm10"))
+    assert np.allclose(reports["pm25"].monthly_average(), reporting.monthly_average(data, "Harlington", "pm25"))
+    assert reports["no"].peak_hour_date("2021-01-01") == ("20:00", 13.00595)
+
+
+def test_get_date_index():
+    """
+    Tests that the date index is built once and rebuilt when the rows of the station data change.
+    """
+
+    data = reporting.load_data()
+    station_data = data["Harlington"]
+    date_index = reporting.get_date_index(station_data)
+    assert reporting.get_date_index(station_data) is date_index
+    assert date_index.rows("2021-01-02") == slice(24, 48)
+    assert date_index.rows("2020-01-01") == slice(0, 0)
+    first_week = station_data.iloc[:24 * 7]
+    assert reporting.get_date_index(first_week).rows("2021-12-31") == slice(168, 168)
+
+
+def test_slice_dates():
+    """
+    Tests that slicing a date range returns every reading between the two dates.
+    """
+
+    data = reporting.load_data()
+    january = reporting.slice_dates(data, "2021-01-01", "2021-01-31", "Harlington")
+    assert len(january) == 31 * 24
+    assert (january["date"].str[5:7] == "01").all()
+
+
+def test_rolling_average():
+    """
+    Tests the rolling average, including the minimum coverage rule for windows with missing data.
+    """
+
+    data = {"Station": pd.DataFrame({"no": [1.0, 2.0, np.nan, np.nan, 5.0, 6.0]},
+                                    index=pd.date_range("2021-01-01 01:00", periods=6, freq="h"))}
+    result = reporting.rolling_average(data, "Station", "no", window=2, min_coverage=1)
+    assert np.allclose(result, [np.nan, 1.5, np.nan, np.nan, np.nan, 5.5], equal_nan=True)
+    result = reporting.rolling_average(data, "Station", "no", window=2, min_coverage=0.5)
+    assert np.allclose(result, [1, 1.5, 2, np.nan, 5, 5.5], equal_nan=True)
+
+
+def test_rolling_max():
+    """
+    Tests that the rolling maximum matches the maximum of each window.
+    """
+
+    values = np.random.default_rng(0).random(100)
+    data = {"Station": pd.DataFrame({"no": values}, index=pd.date_range("2021-01-01 01:00", periods=100, freq="h"))}
+    result = reporting.rolling_max(data, "Station", "no", window=7, min_coverage=1)
+    assert np.isnan(result[:6]).all()
+    assert np.array_equal(result[6:], [values[i - 6:i + 1].max() for i in range(6, 100)])
+
+
+def test_rolling_statistics():
+    """
+    Tests that rolling statistics are calculated for every station, pollutant and window.
+    """
+
+    data = reporting.load_data()
+    result = reporting.rolling_statistics(data, windows=(8, 24))
+    assert len(result["Harlington"]["pm25"][8]["average"]) == 8760
+    assert np.allclose(result["Harlington"]["no"][24]["max"],
+                       reporting.rolling_max(data, "Harlington", "no", window=24), equal_nan=True)
+
+
+def test_quantile_sketch():
+    """
+    Tests that merged sketches estimate quantiles within the relative accuracy.
+    """
+
+    values = np.random.default_rng(0).lognormal(2, 1, 10000)
+    sketch = reporting.QuantileSketch(0.01)
+    other = reporting.QuantileSketch(0.01)
+    sketch.add(values[:5000])
+    other.add(values[5000:])
+    sketch.merge(other)
+    assert sketch.count == 10000
+    for q in [0.5, 0.95, 0.99]:
+        exact = np.quantile(values, q, method="lower")
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact
+
+
+def test_station_quantiles():
+    """
+    Tests that quantiles are estimated for each month of the year.
+    """
+
+    data = reporting.load_data()
+    result = reporting.station_quantiles(data, "Harlington", "pm10", granularity="month")
+    assert len(result) == 12
+    median, p95, p99 = result["2021-01"]
+    assert median <= p95 <= p99
+
+
+def test_stream_quantiles():
+    """
+    Tests that daily sketches built while streaming can be combined into yearly quantiles.
+    """
+
+    data = reporting.load_data()
+    sketches = reporting.stream_quantiles("data/Pollution-London Harlington.csv", chunk_size=1000)
+    assert len(sketches["no"]) == 365
+    yearly = reporting.quantile_table(reporting.combine_sketches(sketches["no"], "year"))
+    assert yearly == reporting.station_quantiles(data, "Harlington", "no", granularity="year")
+
+
+def test_rollup_cube(tmp_path):
+    """
+    Tests that the reporting functions answer from a saved rollup cube with the same results as the loaded data.
+    """
+
+    data = reporting.load_data()
+    filename = str(tmp_path / "rollup.npz")
+    reporting.build_rollup().save(filename)
+    rollup_cube = reporting.RollupCube.load(filename)
+    assert np.allclose(reporting.daily_average(rollup_cube, "Harlington", "no"),
+                       reporting.daily_average(data, "Harlington", "no"))
+    assert np.allclose(reporting.hourly_average(rollup_cube, "Harlington", "pm10"),
+                       reporting.hourly_average(data, "Harlington", "pm10"))
+    assert reporting.count_missing_data(rollup_cube, "Harlington", "no") == 70
+    assert reporting.peak_hour_date(rollup_cube, "2021-01-01", "Harlington", "no") == ("20:00", 13.00595)
+
+
+def test_rollup_cube_update_from_csv(tmp_path):
+    """
+    Tests that only the readings appended to a csv file are added to the rollup cube.
+    """
+
+    with open("data/Pollution-London Harlington.csv") as f:
+        lines = f.readlines()
+    filename = tmp_path / "Pollution-London Harlington.csv"
+    filename.write_text("".join(lines[:1001]))
+    rollup_cube = reporting.build_rollup({"Harlington": str(filename)})
+    assert rollup_cube.num_rows("Harlington") == 1000
+    filename.write_text("".join(lines))
+    rollup_cube.update_from_csv("Harlington", str(filename))
+    assert rollup_cube.num_rows("Harlington") == 8760
+    assert reporting.count_missing_data(rollup_cube, "Harlington", "no") == 70
+
+
+def test_rollup_cube_unsupported():
+    """
+    Tests that functions needing the readings themselves name the function when given a rollup cube.
+    """
+
+    rollup_cube = reporting.build_rollup()
+    for function, arguments in [(reporting.daily_median, ("Harlington", "no")),
+                                (reporting.slice_dates, ("2021-01-01", "2021-01-02", "Harlington")),
+                                (reporting.gap_analysis, ("Harlington", "no")),
+                                (reporting.monthly_statistics, ("Harlington", "no")),
+                                (reporting.station_correlation, ("no",)),
+                                (reporting.exceedances, ({"no": {"hourly": 100}},))]:
+        with pytest.raises(TypeError, match="does not support a RollupCube"):
+            function(rollup_cube, *arguments)
+    with pytest.raises(TypeError, match="^daily_median "):
+        reporting.daily_median(rollup_cube, "Harlington", "no")
+
+
+def test_fill_gaps():
+    """
+    Tests each fill method, including leaving gaps longer than the limit.
+    """
+
+    values = np.array([[1], [np.nan], [np.nan], [4], [np.nan], [np.nan], [np.nan], [8]], dtype=float)
+    filled = reporting.fill_gaps(values.copy(), "linear")
+    assert filled[:, 0].tolist() == [1, 2, 3, 4, 5, 6, 7, 8]
+    filled = reporting.fill_gaps(values.copy(), "ffill", limit=2)
+    assert np.array_equal(filled[:, 0], [1, 1, 1, 4, np.nan, np.nan, np.nan, 8], equal_nan=True)
+    filled = reporting.fill_gaps(values.copy(), "profile", hours=np.array([0, 1, 0, 1, 0, 1, 0, 1]))
+    assert filled[:, 0].tolist() == [1, 6, 1, 4, 1, 6, 1, 8]
+
+
+def test_fill_station_gaps_dropped_rows():
+    """
+    Tests that linear filling interpolates by time across hours that have no row at all, and fills only the gaps.
+    """
+
+    index = pd.date_range("2021-01-01 01:00", periods=10, freq="h")
+    values = np.arange(10, dtype=float)
+    values[[3, 4]] = np.nan
+    keep = [0, 1, 2, 3, 4, 7, 8, 9]  # Hours 5 and 6 were never recorded
+    station_data = pd.DataFrame({"no": values[keep], "pm10": values[keep]}, index=index[keep])
+    reporting.fill_station_gaps({"A": station_data}, "A", method="linear", pollutants=["no"])
+    assert station_data["no"].tolist() == [0, 1, 2, 3, 4, 7, 8, 9]
+    assert station_data["pm10"].isna().sum() == 2
+    limited = np.array([1, np.nan, 3, np.nan, np.nan, 6])
+    reporting.fill_gaps(limited, "constant", new_value=0, limit=1)
+    assert np.array_equal(limited, [1, 0, 3, np.nan, np.nan, 6], equal_nan=True)
+
+
+def test_fill_station_gaps():
+    """
+    Tests that every pollutant of a station is filled in one call.
+    """
+
+    data = reporting.load_data()
+    reporting.fill_station_gaps(data, "Marylebone Road", method="profile")
+    for pollutant in ["no", "pm10", "pm25"]:
+        assert reporting.count_missing_data(data, "Marylebone Road", pollutant) == 0
+
+
+def test_find_runs():
+    """
+    Tests that runs of True values are found with their start and length.
+    """
+
+    starts, lengths = reporting.find_runs(np.array([True, False, True, True, False, False, True]))
+    assert starts.tolist() == [0, 2, 6]
+    assert lengths.tolist() == [1, 2, 1]
+
+
+def test_gap_analysis():
+    """
+    Tests that the gaps agree with the number of missing data values.
+    """
+
+    data = reporting.load_data()
+    result = reporting.gap_analysis(data, "Harlington", "no")
+    assert result["missing"] == reporting.count_missing_data(data, "Harlington", "no")
+    assert sum(length for start, end, length in result["spans"]) == 70
+    assert result["mask"].sum() == 70
+    assert len(result["monthly_coverage"]) == 12
+    assert len(reporting.gap_analysis_all(data)) == 3
+
+
+def test_gap_analysis_dropped_rows():
+    """
+    Tests that hours without any row count as missing in the gaps and the monthly coverage.
+    """
+
+    data = reporting.load_data()
+    station_data = data["Harlington"]
+    dropped = station_data.drop(station_data.index[100:600])  # 500 January hours that were never recorded
+    result = reporting.gap_analysis({"Harlington": dropped}, "Harlington", "pm10")
+    expected = reporting.gap_analysis(data, "Harlington", "pm10")
+    assert len(result["mask"]) == 8760
+    assert result["missing"] == expected["missing"] + 500 - expected["mask"][100:600].sum()
+    assert result["longest_gap"] >= 500
+    assert ("2021-01-05 05:00:00", "2021-01-26 00:00:00", 500) in result["spans"]
+    assert abs(result["monthly_coverage"]["2021-01"] - (1 - (500 + expected["mask"][:744].sum()
+                                                               - expected["mask"][100:600].sum()) / 744)) < 1e-12
+
+
+def test_discover_stations():
+    """
+    Tests that every station csv file in the data directory is found and named.
+    """
+
+    stations = reporting.discover_stations("data")
+    assert sorted(stations.keys()) == ["Harlington", "Marylebone Road", "N Kensington"]
+    assert stations["Harlington"] == "data/Pollution-London Harlington.csv"
+
+
+def test_station_registry():
+    """
+    Tests that stations are only loaded when they are used, or all at once with load_all.
+    """
+
+    data = reporting.load_data()
+    assert not data.is_loaded("Harlington")
+    assert len(data["Harlington"]) == 8760
+    assert data.is_loaded("Harlington")
+    assert not data.is_loaded("N Kensington")
+    data.load_all(workers=3)
+    assert all(data.is_loaded(station) for station in data)
+
+
+def test_load_binary_station(tmp_path):
+    """
+    Tests that a station is imported into the binary store and memory-mapped with the same values as the csv file.
+    """
+
+    station_data = reporting.load_binary_station("data/Pollution-London Harlington.csv", str(tmp_path))
+    values = station_data["no"].to_numpy()
+    while values is not None and not isinstance(values, np.memmap):  # Follow the views back to the mapped file
+        values = values.base
+    assert values is not None
+    expected = reporting.load_station("data/Pollution-London Harlington.csv")
+    assert np.array_equal(station_data["pm10"].to_numpy(), expected["pm10"].to_numpy(), equal_nan=True)
+    assert station_data.index.equals(expected.index)
+
+
+def test_is_stale(tmp_path):
+    """
+    Tests that the binary store is invalidated when the csv file changes.
+    """
+
+    filename = tmp_path / "Pollution-London Harlington.csv"
+    with open("data/Pollution-London Harlington.csv") as f:
+        filename.write_text(f.read())
+    station_directory = reporting.import_station(str(filename), str(tmp_path / "store"))
+    assert not reporting.is_stale(station_directory, str(filename))
+    with open(filename, "a") as f:
+        f.write("\n2022-01-01,01:00:00,1,2,3")
+    assert reporting.is_stale(station_directory, str(filename))
+    assert len(reporting.load_binary_station(str(filename), str(tmp_path / "store"))) == 8761
+    assert reporting.is_stale(station_directory, str(filename), np.float32)
+    assert reporting.load_binary_station(str(filename), str(tmp_path / "store"), np.float32)["no"].dtype == np.float32
+
+
+def test_reimport_keeps_open_stations(tmp_path):
+    """
+    Tests that importing a changed csv file does not change or truncate a station that is already open.
+    """
+
+    filename = tmp_path / "Pollution-London Harlington.csv"
+    with open("data/Pollution-London Harlington.csv") as f:
+        lines = f.read().splitlines()
+    filename.write_text("\n".join(lines))
+    store = str(tmp_path / "store")
+    station_data = reporting.load_binary_station(str(filename), store)
+    lines[1] = "2021-01-01,01:00:00,999,999,999"
+    filename.write_text("\n".join(lines[:100]))
+    reloaded = reporting.load_binary_station(str(filename), store)
+    assert len(reloaded) == 99 and reloaded["no"].iloc[0] == 999
+    assert station_data["no"].iloc[0] == 1.43738
+    assert len(station_data) == 8760 and station_data["pm10"].iloc[-1] == 7.834
+
+
+def test_group_statistics():
+    """
+    Tests the statistics of each group, ignoring NaN and reporting empty groups as NaN.
+    """
+
+    values = np.array([1, 2, np.nan, 4, np.nan])
+    keys = np.array([0, 0, 1, 1, 2])
+    result = reporting.group_statistics(values, keys, 3)
+    assert result["sum"].tolist() == [3, 4, 0]
+    assert result["count"].tolist() == [2, 1, 0]
+    assert np.array_equal(result["mean"], [1.5, 4, np.nan], equal_nan=True)
+    assert np.array_equal(result["max"], [2, 4, np.nan], equal_nan=True)
+    assert result["rows"].tolist() == [2, 2, 1]
+
+
+def test_calendar_statistics():
+    """
+    Tests the weekday and seasonal statistics, and that the monthly means match monthly_average.
+    """
+
+    data = reporting.load_data()
+    assert list(reporting.weekday_statistics(data, "Harlington", "no").index) == reporting.WEEKDAYS
+    seasons = reporting.seasonal_statistics(data, "Harlington", "no")
+    assert seasons["count"].sum() + 70 == 8760
+    assert reporting.monthly_statistics(data, "Harlington", "no")["mean"].tolist() == reporting.monthly_average(
+        data, "Harlington", "no")
+    assert len(reporting.weekly_statistics(data, "Harlington", "no")) == 53
+
+
+def test_resample_hourly():
+    """
+    Tests that dropped and duplicate readings are aligned onto a regular hourly timeline.
+    """
+
+    station_data = reporting.load_station("data/Pollution-London Harlington.csv")
+    irregular = pd.concat([station_data.iloc[:5], station_data.iloc[6:30], station_data.iloc[29:]])
+    result = reporting.resample_hourly({"Harlington": irregular}, "Harlington")
+    assert len(result) == 8760
+    assert str(result.index[0]) == "2021-01-01 01:00:00"
+    assert np.isnan(result["pm10"].iloc[5])
+    assert result["pm10"].iloc[29] == station_data["pm10"].iloc[29]
+
+
+def test_daily_average_irregular_rows():
+    """
+    Tests that dropping readings does not move the remaining readings into other days or hours.
+    """
+
+    data = reporting.load_data()
+    expected = reporting.daily_average(data, "Harlington", "pm10")
+    station_data = data["Harlington"]
+    irregular = station_data.drop(station_data.index[[3, 30, 31]])
+    result = reporting.daily_average({"Harlington": irregular}, "Harlington", "pm10")
+    assert len(result) == 365
+    assert result[2:] == expected[2:]
+    pm10 = station_data["pm10"]
+    assert abs(result[0] - np.nanmean(pm10.iloc[:24].drop(pm10.index[3]))) < 1e-9
+    assert abs(result[1] - np.nanmean(pm10.iloc[24:48].drop(pm10.index[[30, 31]]))) < 1e-9
+    assert result[1] != expected[1]
+    assert reporting.peak_hour_date({"Harlington": irregular}, "2021-01-01", "Harlington", "no") == ("20:00", 13.00595)
+
+
+def test_exceedances():
+    """
+    Tests that hourly, daily and rolling exceedances agree with the individual report functions.
+    """
+
+    data = reporting.load_data()
+    thresholds = {"pm10": {"hourly": 50, "daily": 40, "rolling": {8: 45}}, "no": {"hourly": 200}}
+    result = reporting.exceedances(data, thresholds)
+    assert set(result) == {"Harlington", "Marylebone Road", "N Kensington"}
+    pm10 = result["Harlington"]["pm10"]
+    daily = reporting.daily_average(data, "Harlington", "pm10")
+    assert pm10["daily"]["count"] == sum(1 for value in daily if isinstance(value, float) and value > 40)
+    assert pm10["daily"]["episodes"][0] == ("2021-03-02", "2021-03-03", 2)
+    first_day = next(day for day, value in enumerate(daily) if isinstance(value, float) and value > 40)
+    assert pm10["daily"]["first"] == str(np.datetime64("2021-01-01") + first_day)
+    rolling = np.asarray(reporting.rolling_average(data, "Harlington", "pm10", 8), dtype=float)
+    assert pm10["rolling 8h"]["count"] == (rolling > 45).sum()
+    assert pm10["hourly"]["first"] == "2021-02-20 03:00:00"
+    assert sum(length for _, _, length in pm10["hourly"]["episodes"]) == pm10["hourly"]["count"]
+    assert result["Harlington"]["no"]["hourly"] == {"count": 0, "first": None, "last": None, "episodes": []}
+
+
+def test_station_correlation():
+    """
+    Tests the pairwise correlation matrix against pandas, which also ignores missing values pairwise.
+    """
+
+    data = reporting.load_data()
+    aligned = reporting.align_stations(data, "pm10")
+    assert aligned.shape == (8760, 3)
+    correlation = reporting.station_correlation(data, "pm10")
+    np.testing.assert_allclose(correlation.to_numpy(), aligned.corr(min_periods=24).to_numpy(), atol=1e-12)
+    assert list(correlation.index) == ["Harlington", "Marylebone Road", "N Kensington"]
+    assert set(reporting.correlation_matrices(data)) == {"no", "pm10", "pm25"}
+
+
+def test_station_correlation_no_stations():
+    """
+    Tests that a pollutant no station records gives empty frames rather than an error.
+    """
+
+    data = reporting.load_data()
+    aligned = reporting.align_stations(data, "o3")
+    assert aligned.shape == (0, 0)
+    assert isinstance(aligned.index, pd.DatetimeIndex)
+    assert reporting.station_correlation(data, "o3").empty
+    empty = pd.DataFrame({"no": []}, index=pd.DatetimeIndex([], name="timestamp"))
+    matrices = reporting.correlation_matrices({"A": empty})
+    assert list(matrices) == ["no"]
+    assert matrices["no"].empty
+
+
+def test_lagged_correlation():
+    """
+    Tests that a station shifted by a few hours is perfectly correlated at that lag, even if it starts on a later day.
+    """
+
+    index = pd.date_range("2021-01-01 01:00", periods=24 * 20, freq="h")
+    values = np.sin(np.arange(len(index)) / 5) + np.arange(len(index)) % 7
+    values[[10, 50, 51]] = np.nan
+    leading = pd.DataFrame({"no": values}, index=index)
+    lagging = pd.DataFrame({"no": values}, index=index + pd.Timedelta(hours=27))
+    data = {"A": leading, "B": lagging.iloc[21:]}  # B starts on the second day
+    aligned = reporting.align_stations(data, "no")
+    assert len(aligned) == 24 * 22
+    assert np.isnan(aligned["B"].iloc[:45]).all()
+    correlations = reporting.lagged_correlation(data, "no", range(-30, 31))
+    best = max(correlations, key=lambda lag: correlations[lag].loc["A", "B"])
+    assert best == 27
+    assert abs(correlations[27].loc["A", "B"] - 1) < 1e-12
+    assert abs(correlations[-27].loc["B", "A"] - 1) < 1e-12
+    assert np.isnan(reporting.pairwise_correlation(np.ones((30, 1)), np.arange(30.0)[:, None]))[0, 0]
+
+
+def test_anomaly_detector():
+    """
+    Tests that a spike is flagged and that row by row, chunked and whole-station detection agree.
+    """
+
+    index = pd.date_range("2021-01-01 01:00", periods=24 * 10, freq="h")
+    values = 10 + np.sin(np.arange(len(index)) * np.pi / 12)
+    values[100] = 40
+    values[[5, 101]] = np.nan
+    station_data = pd.DataFrame({"no": values}, index=index)
+    anomalies = reporting.detect_anomalies({"A": station_data}, "A", "no")
+    assert list(anomalies.index.astype(str)) == ["2021-01-05 05:00:00"]
+    assert anomalies["value"].iloc[0] == 40
+
+    detector = reporting.AnomalyDetector("no")
+    scores = [detector.add(timestamp, value) for timestamp, value in zip(index, values)]
+    chunked = reporting.AnomalyDetector("no")
+    chunk_scores = np.concatenate([chunked.update(station_data.iloc[i:i + 50]) for i in range(0, len(index), 50)])
+    np.testing.assert_allclose(scores, chunk_scores, rtol=1e-9)
+    assert np.isnan(chunk_scores[:24]).all()  # Warming up
+    assert [a[0] for a in detector.anomalies] == [a[0] for a in chunked.anomalies]
+    assert abs(detector.mean - chunked.mean) < 1e-9 and detector.count == chunked.count == 238
+
+
+def test_stream_anomalies():
+    """
+    Tests that streaming a file flags the same readings as the loaded station.
+    """
+
+    data = reporting.load_data()
+    expected = reporting.detect_anomalies(data, "Marylebone Road", "no")
+    detectors = reporting.stream_anomalies("data/Pollution-London Marylebone Road.csv", ["no"], chunk_size=1000)
+    assert len(expected) > 0
+    assert list(detectors["no"].anomaly_table().index) == list(expected.index)
+
+
+def test_exceedances_missing_pollutant():
+    """
+    Tests that a station which does not record a pollutant with a threshold is reported without any limits.
+    """
+
+    data = reporting.load_data()
+    result = reporting.exceedances({"Harlington": data["Harlington"]}, {"o3": {"hourly": 1}, "no": {"hourly": 200}})
+    assert result["Harlington"] == {"no": {"hourly": {"count": 0, "first": None, "last": None, "episodes": []}}}
+    assert reporting.exceedances({"Harlington": data["Harlington"]}, {"o3": {"daily": 1}}) == {"Harlington": {}}
+    empty = data["Harlington"].iloc[:0]
+    result = reporting.exceedances({"Empty": empty, "Harlington": data["Harlington"]},
+                                   {"no": {"hourly": 1, "daily": 1, "rolling": {8: 1}}})
+    assert result["Empty"]["no"]["daily"] == {"count": 0, "first": None, "last": None, "episodes": []}
+    assert result["Harlington"]["no"]["hourly"]["count"] > 0